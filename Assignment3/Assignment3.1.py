@@ -1,9 +1,78 @@
 import tkinter as tk
 from tkinter import filedialog, ttk
-from PIL import Image, ImageTk, ImageEnhance
+from PIL import Image, ImageTk
 import cv2
 import numpy as np
-from collections import deque
+import json
+import os
+import time
+from collections import deque, OrderedDict
+from contextlib import contextmanager
+import image_engine as engine
+
+# Tiled rendering of the processed canvas (used when the crop is scaled up)
+TILE_SIZE = 256         # Edge length of one rendered tile in pixels
+TILE_PREFETCH = 1       # Extra ring of tiles rendered around the visible area
+TILE_CACHE_SIZE = 96    # Maximum number of rendered tiles kept in the LRU cache
+
+# Histogram panel
+HIST_WIDTH = 512        # Canvas size of the histogram panel in pixels
+HIST_HEIGHT = 80
+HIST_COLORS = ("#ff4040", "#40d040", "#4080ff", "#ffffff")  # R, G, B, luma
+
+# Render profiler
+PROFILE_TRACE_LIMIT = 20000  # Maximum number of trace events kept in memory
+
+class RenderProfiler:
+    """
+    Times the stages of each interaction (resize, enhance, array conversion,
+    PhotoImage creation, canvas redraw). Stage times are summed per frame and
+    every stage is also kept as a trace event in Chrome trace format, which can
+    be opened in chrome://tracing or Perfetto for offline analysis.
+    """
+    def __init__(self):
+        self.enabled = False
+        self.frame = {}               # Stage name -> accumulated seconds in this frame
+        self.frame_start = None
+        self.events = deque(maxlen=PROFILE_TRACE_LIMIT)
+        self.origin = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name):
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        if self.frame_start is None:
+            self.frame_start = start
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.frame[name] = self.frame.get(name, 0.0) + elapsed
+            self.events.append({
+                "name": name, "ph": "X", "pid": 0, "tid": 0,
+                "ts": (start - self.origin) * 1e6, "dur": elapsed * 1e6
+            })
+
+    def end_frame(self, label, memory_bytes):
+        # Closes the current frame and returns a one-line summary (or None)
+        if not self.enabled or self.frame_start is None:
+            return None
+        total = time.perf_counter() - self.frame_start
+        self.events.append({
+            "name": label, "ph": "X", "pid": 0, "tid": 1,
+            "ts": (self.frame_start - self.origin) * 1e6, "dur": total * 1e6,
+            "args": {"memory_mb": memory_bytes / 1e6, **{k: v * 1e3 for k, v in self.frame.items()}}
+        })
+        stages = "  ".join(f"{k} {v * 1e3:.1f}" for k, v in self.frame.items())
+        self.frame = {}
+        self.frame_start = None
+        return f"[{label}] total {total * 1e3:.1f} ms | {stages} | images {memory_bytes / 1e6:.1f} MB"
+
+    def dump(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": list(self.events), "displayTimeUnit": "ms"}, f)
 
 class ImageEditor:
     def __init__(self, root):
@@ -16,6 +85,17 @@ class ImageEditor:
         self.processed_img = None     # The processed image after crop/scale/adjustments
         self.display_ratio = 1.0      # Ratio for fitting original image on the left canvas
         self.current_scale = 1.0      # Current scaling factor for the cropped image
+        self.tiled = False            # True when the processed image is rendered tile by tile
+        self.processed_size = (0, 0)  # Size (w, h) of the processed image, also valid when tiled
+        self.contrast_mean = 0        # Global luma mean used by contrast when rendering tiles
+        self.tile_cache = OrderedDict()  # (tx, ty) -> PhotoImage, least recently used first
+        self.visible_tiles = {}       # (tx, ty) -> canvas item currently placed on proc_canvas
+        self.tile_refresh_pending = False
+        self.full_loader = None       # Background load of the full-resolution image, if any
+        self.save_task = None         # Background save in progress, if any
+        self.hist_source = None       # Image the base histogram was computed from
+        self.base_hist = None         # R, G, B, luma counts of a proxy of hist_source
+        self.profiler = RenderProfiler()
         
         self.history_stack = deque(maxlen=20)
         self.redo_stack = deque(maxlen=20)
@@ -42,7 +122,14 @@ class ImageEditor:
         self.proc_canvas.grid(row=0, column=0, sticky="nsew")
         xbar = ttk.Scrollbar(proc_container, orient=tk.HORIZONTAL, command=self.proc_canvas.xview)
         ybar = ttk.Scrollbar(proc_container, orient=tk.VERTICAL, command=self.proc_canvas.yview)
-        self.proc_canvas.configure(xscrollcommand=xbar.set, yscrollcommand=ybar.set)
+        def _on_xscroll(*args):
+            xbar.set(*args)
+            self.schedule_tile_refresh()
+        def _on_yscroll(*args):
+            ybar.set(*args)
+            self.schedule_tile_refresh()
+        self.proc_canvas.configure(xscrollcommand=_on_xscroll, yscrollcommand=_on_yscroll)
+        self.proc_canvas.bind("<Configure>", lambda e: self.schedule_tile_refresh())
         xbar.grid(row=1, column=0, sticky="we")
         ybar.grid(row=0, column=1, sticky="ns")
         proc_container.rowconfigure(0, weight=1)
@@ -56,6 +143,16 @@ class ImageEditor:
         self.proc_canvas.bind_all("<MouseWheel>", _on_mousewheel)
         self.proc_canvas.bind_all("<Shift-MouseWheel>", _on_shiftmousewheel)
 
+        # Histogram of the processed result, remapped on every slider change
+        hist_frame = ttk.Frame(main_frame)
+        hist_frame.pack(fill=tk.X, pady=(5, 0))
+        ttk.Label(hist_frame, text="Histogram (R G B luma)").pack(side=tk.LEFT, anchor=tk.N, padx=5)
+        self.hist_canvas = tk.Canvas(hist_frame, width=HIST_WIDTH, height=HIST_HEIGHT, bg='#2E2E2E',
+                                     highlightthickness=0)
+        self.hist_canvas.pack(side=tk.LEFT, padx=5)
+        self.hist_lines = [self.hist_canvas.create_line(0, HIST_HEIGHT, HIST_WIDTH, HIST_HEIGHT, fill=color)
+                           for color in HIST_COLORS]
+
         control_panel = ttk.Frame(main_frame)
         control_panel.pack(fill=tk.X, pady=10)
         
@@ -64,6 +161,7 @@ class ImageEditor:
         ttk.Button(file_frame, text="Open (Ctrl+O)", command=self.open_image).pack(side=tk.LEFT, padx=2)
         self.save_btn = ttk.Button(file_frame, text="Save (Ctrl+S)", command=self.save_image, state=tk.DISABLED)
         self.save_btn.pack(side=tk.LEFT, padx=2)
+        ttk.Button(file_frame, text="Save Options", command=self.show_save_options).pack(side=tk.LEFT, padx=2)
         ttk.Button(file_frame, text="Undo (Ctrl+Z)", command=self.undo).pack(side=tk.LEFT, padx=2)
         ttk.Button(file_frame, text="Redo (Ctrl+Y)", command=self.redo).pack(side=tk.LEFT, padx=2)
         
@@ -115,9 +213,22 @@ class ImageEditor:
         rotate_frame.pack(side=tk.LEFT, padx=5)
         ttk.Button(rotate_frame, text="Rotate Left", command=lambda: self.rotate_image(90)).pack(side=tk.LEFT)
         ttk.Button(rotate_frame, text="Rotate Right", command=lambda: self.rotate_image(-90)).pack(side=tk.LEFT)
+        # Free rotation by any angle; the canvas grows to fit the rotated corners
+        self.angle_var = tk.DoubleVar(value=15)
+        ttk.Spinbox(rotate_frame, from_=-180, to=180, increment=5, textvariable=self.angle_var, width=5).pack(side=tk.LEFT, padx=2)
+        ttk.Button(rotate_frame, text="Rotate by Angle", command=lambda: self.rotate_image(self.angle_var.get())).pack(side=tk.LEFT)
+        
+        # Encoder settings used by save_image (each applies to its own format)
+        self.png_compression_var = tk.IntVar(value=1)
+        self.jpeg_quality_var = tk.IntVar(value=95)
+        self.jpeg_progressive_var = tk.BooleanVar(value=False)
+        self.webp_quality_var = tk.IntVar(value=90)
+        self.atomic_save_var = tk.BooleanVar(value=True)
         
         self.status_bar = ttk.Label(self.root, relief=tk.SUNKEN, anchor=tk.W)
         self.status_bar.pack(fill=tk.X)
+        # Profiler overlay under the status bar, shown with Ctrl+P
+        self.profile_bar = ttk.Label(self.root, relief=tk.SUNKEN, anchor=tk.W, font=('Courier', 9))
         
         # Crop selection on original image
         self.orig_canvas.bind("<ButtonPress-1>", self.start_crop)
@@ -129,6 +240,8 @@ class ImageEditor:
         self.root.bind("<Control-s>", lambda e: self.save_image())
         self.root.bind("<Control-z>", lambda e: self.undo())
         self.root.bind("<Control-y>", lambda e: self.redo())
+        self.root.bind("<Control-p>", lambda e: self.toggle_profiler())
+        self.root.bind("<Control-t>", lambda e: self.dump_profile_trace())
     
     def show_placeholders(self):
         self.orig_canvas.delete("all")
@@ -138,24 +251,54 @@ class ImageEditor:
     
     def open_image(self):
         filetypes = [
-            ("Image Files", "*.jpg *.jpeg *.png *.bmp"),
+            ("Image Files", "*.jpg *.jpeg *.png *.bmp *.tif *.tiff *.webp"),
             ("All Files", "*.*")
         ]
         path = filedialog.askopenfilename(filetypes=filetypes)
         if path:
             try:
-                self.original_img = cv2.cvtColor(cv2.imread(path), cv2.COLOR_BGR2RGB)
-                self.cropped_img = None
-                self.reset_processing_state()
-                self.update_displays()
-                self.save_btn.state(["!disabled"])
-                self.scale_slider.config(state="normal")
-                self.status_bar.config(text=f"Loaded image: {path}")
+                # Large JPEGs show a decoder-downscaled preview first and load
+                # full resolution in the background; other files load once
+                factor = engine.preview_factor(path)
+                self.full_loader = None
+                self.show_loaded_image(engine.load_image(path, factor))
+                if factor > 1:
+                    self.save_btn.state(["disabled"])
+                    self.full_loader = engine.BackgroundTask(engine.load_image, path)
+                    self.root.after(100, self.check_full_load, self.full_loader)
+                    self.status_bar.config(text=f"Preview (1/{factor}): {path} - loading full resolution...")
+                else:
+                    self.status_bar.config(text=f"Loaded image: {path}")
             except Exception as e:
                 self.status_bar.config(text=f"Error: {str(e)}")
+
+    def show_loaded_image(self, img):
+        self.original_img = img
+        self.cropped_img = None
+        self.reset_processing_state()
+        self.update_displays()
+        self.save_btn.state(["!disabled"])
+        self.scale_slider.config(state="normal")
+
+    def check_full_load(self, loader):
+        if loader is not self.full_loader:
+            return  # Another image was opened meanwhile
+        if not loader.poll():
+            self.root.after(100, self.check_full_load, loader)
+            return
+        self.full_loader = None
+        if loader.error is not None:
+            self.status_bar.config(text=f"Error: {str(loader.error)}")
+            return
+        self.show_loaded_image(loader.result)
+        self.status_bar.config(text=f"Loaded image: {loader.args[0]}")
     
     def reset_processing_state(self):
         self.processed_img = self.original_img.copy() if self.original_img is not None else None
+        self.tiled = False
+        self.tile_cache.clear()
+        if self.processed_img is not None:
+            self.processed_size = (self.processed_img.shape[1], self.processed_img.shape[0])
         self.current_scale = 1.0
         self.scale_var.set(100)
         self.brightness_var.set(1.0)
@@ -171,17 +314,145 @@ class ImageEditor:
             canvas_h = self.orig_canvas.winfo_height()
             ratio = min(canvas_w/w, canvas_h/h)
             self.display_ratio = ratio
-            disp_img = cv2.resize(self.original_img, (int(w*ratio), int(h*ratio)))
-            self.tk_orig = ImageTk.PhotoImage(Image.fromarray(disp_img))
-            self.orig_canvas.create_image(canvas_w//2, canvas_h//2, image=self.tk_orig, anchor=tk.CENTER)
+            with self.profiler.stage("fit_resize"):
+                disp_img = cv2.resize(self.original_img, (int(w*ratio), int(h*ratio)))
+            with self.profiler.stage("photoimage"):
+                self.tk_orig = ImageTk.PhotoImage(Image.fromarray(disp_img))
+            with self.profiler.stage("canvas"):
+                self.orig_canvas.create_image(canvas_w//2, canvas_h//2, image=self.tk_orig, anchor=tk.CENTER)
         # Draw processed image (actual size, not fit, use scrollbars if needed)
-        if self.processed_img is not None:
-            self.proc_canvas.delete("all")
+        if self.tiled:
+            with self.profiler.stage("canvas"):
+                self.proc_canvas.delete("all")
+                self.visible_tiles.clear()
+                w, h = self.processed_size
+                self.proc_canvas.config(scrollregion=(0, 0, w, h))
+            self.draw_visible_tiles()
+        elif self.processed_img is not None:
+            with self.profiler.stage("canvas"):
+                self.proc_canvas.delete("all")
+                self.visible_tiles.clear()
             h, w = self.processed_img.shape[:2]
-            self.tk_proc = ImageTk.PhotoImage(Image.fromarray(self.processed_img))
-            self.proc_canvas.create_image(0, 0, image=self.tk_proc, anchor=tk.NW)
-            self.proc_canvas.config(scrollregion=(0, 0, w, h))
-    
+            with self.profiler.stage("photoimage"):
+                self.tk_proc = ImageTk.PhotoImage(Image.fromarray(self.processed_img))
+            with self.profiler.stage("canvas"):
+                self.proc_canvas.create_image(0, 0, image=self.tk_proc, anchor=tk.NW)
+                self.proc_canvas.config(scrollregion=(0, 0, w, h))
+        self.update_histogram()
+        self.end_profile_frame("update")
+
+    def update_histogram(self):
+        # The base histogram is counted once per source image on a small proxy;
+        # slider changes only map it through the brightness/contrast curve
+        source = self.cropped_img if self.cropped_img is not None else self.original_img
+        if source is None:
+            return
+        with self.profiler.stage("histogram"):
+            if source is not self.hist_source:
+                self.base_hist = engine.base_histogram(source)
+                self.hist_source = source
+            mean = self.contrast_mean if self.tiled else None  # Tiles use a fixed mean
+            hist = engine.adjusted_histogram(self.base_hist, self.brightness_var.get(),
+                                             self.contrast_var.get(), mean)
+            # Bins 0 and 255 collect everything clipped, so they do not set the scale
+            peak = max(hist[:, 1:255].max(), 1)
+            xs = np.arange(256) * (HIST_WIDTH - 1) / 255
+            for line, channel in zip(self.hist_lines, hist):
+                ys = HIST_HEIGHT - np.minimum(channel / peak, 1.0) * (HIST_HEIGHT - 2)
+                self.hist_canvas.coords(line, *np.column_stack((xs, ys)).ravel().tolist())
+
+    def toggle_profiler(self):
+        self.profiler.enabled = not self.profiler.enabled
+        if self.profiler.enabled:
+            self.profile_bar.config(text="Profiler on - interact with the image to record timings (ms)")
+            self.profile_bar.pack(fill=tk.X, after=self.status_bar)
+        else:
+            self.profile_bar.pack_forget()
+
+    def end_profile_frame(self, label):
+        summary = self.profiler.end_frame(label, self.image_memory())
+        if summary:
+            self.profile_bar.config(text=summary)
+
+    def image_memory(self):
+        # Bytes held by image buffers, including an estimate for cached tiles
+        total = sum(img.nbytes for img in (self.original_img, self.cropped_img, self.processed_img)
+                    if img is not None)
+        return total + len(self.tile_cache) * TILE_SIZE * TILE_SIZE * 3
+
+    def dump_profile_trace(self):
+        if not self.profiler.events:
+            self.status_bar.config(text="No profiler trace recorded yet (Ctrl+P to enable)")
+            return
+        path = filedialog.asksaveasfilename(
+            defaultextension=".json",
+            filetypes=[("Trace Files", "*.json")],
+            title="Save Profiler Trace"
+        )
+        if path:
+            try:
+                self.profiler.dump(path)
+                self.status_bar.config(text=f"Trace saved: {os.path.basename(path)} ({len(self.profiler.events)} events)")
+            except Exception as e:
+                self.status_bar.config(text=f"Trace save failed: {str(e)}")
+
+    def schedule_tile_refresh(self):
+        # Coalesce scroll and resize events into a single tile update
+        if self.tiled and not self.tile_refresh_pending:
+            self.tile_refresh_pending = True
+            self.root.after_idle(self.refresh_tiles)
+
+    def refresh_tiles(self):
+        self.tile_refresh_pending = False
+        if self.tiled:
+            self.draw_visible_tiles()
+            self.end_profile_frame("scroll")
+
+    def draw_visible_tiles(self):
+        # Place only the tiles intersecting the scrolled window (plus prefetch margin)
+        canvas = self.proc_canvas
+        w, h = self.processed_size
+        margin = TILE_SIZE * TILE_PREFETCH
+        x0 = canvas.canvasx(0) - margin
+        y0 = canvas.canvasy(0) - margin
+        x1 = canvas.canvasx(canvas.winfo_width()) + margin
+        y1 = canvas.canvasy(canvas.winfo_height()) + margin
+        cols = range(max(0, int(x0 // TILE_SIZE)), min((w - 1) // TILE_SIZE, int(x1 // TILE_SIZE)) + 1)
+        rows = range(max(0, int(y0 // TILE_SIZE)), min((h - 1) // TILE_SIZE, int(y1 // TILE_SIZE)) + 1)
+        wanted = {(tx, ty) for ty in rows for tx in cols}
+        for key in list(self.visible_tiles):
+            if key not in wanted:
+                canvas.delete(self.visible_tiles.pop(key))
+        # Touch placed tiles so they are never the ones evicted
+        for key in self.visible_tiles:
+            self.tile_cache.move_to_end(key)
+        for tx, ty in sorted(wanted - self.visible_tiles.keys()):
+            photo = self.get_tile(tx, ty)
+            with self.profiler.stage("canvas"):
+                self.visible_tiles[(tx, ty)] = canvas.create_image(
+                    tx * TILE_SIZE, ty * TILE_SIZE, image=photo, anchor=tk.NW
+                )
+
+    def get_tile(self, tx, ty):
+        if (tx, ty) in self.tile_cache:
+            self.tile_cache.move_to_end((tx, ty))
+            return self.tile_cache[(tx, ty)]
+        x, y = tx * TILE_SIZE, ty * TILE_SIZE
+        w, h = self.processed_size
+        tile = self.render_region(x, y, min(TILE_SIZE, w - x), min(TILE_SIZE, h - y))
+        with self.profiler.stage("photoimage"):
+            photo = ImageTk.PhotoImage(Image.fromarray(tile))
+        self.tile_cache[(tx, ty)] = photo
+        while len(self.tile_cache) > max(TILE_CACHE_SIZE, len(self.visible_tiles) + 1):
+            self.tile_cache.popitem(last=False)
+        return photo
+
+    def render_region(self, x, y, w, h):
+        # Resample only the requested output region of the scaled crop
+        with self.profiler.stage("resize"):
+            region = engine.scale_region(self.cropped_img, self.processed_size, x, y, w, h)
+        return self.enhance(region, self.contrast_mean)
+
     def start_crop(self, event):
         self.crop_start = (event.x, event.y)
         self.crop_rect = self.orig_canvas.create_rectangle(
@@ -198,6 +469,11 @@ class ImageEditor:
             )
     
     def finalize_crop(self, event):
+        if self.full_loader is not None:
+            # Crop coordinates would refer to the preview, not the real image
+            self.orig_canvas.delete(self.crop_rect)
+            self.status_bar.config(text="Please wait, loading full resolution...")
+            return
         if self.crop_rect and self.original_img is not None:
             img_w = int(self.original_img.shape[1] * self.display_ratio)
             img_h = int(self.original_img.shape[0] * self.display_ratio)
@@ -244,25 +520,33 @@ class ImageEditor:
         if self.cropped_img is None:
             return
         scale = self.current_scale
-        h, w = self.cropped_img.shape[:2]
-        new_w = max(1, int(w * scale))
-        new_h = max(1, int(h * scale))
-        interp = cv2.INTER_AREA if scale < 1 else cv2.INTER_CUBIC
-        img = cv2.resize(self.cropped_img, (new_w, new_h), interpolation=interp)
-        pil_img = Image.fromarray(img)
-        pil_img = ImageEnhance.Brightness(pil_img).enhance(self.brightness_var.get())
-        pil_img = ImageEnhance.Contrast(pil_img).enhance(self.contrast_var.get())
-        self.processed_img = np.array(pil_img)
+        self.processed_size = engine.scaled_size(self.cropped_img, scale)
+        self.tile_cache.clear()
+        if scale > 1:
+            # Upscaled output is rendered lazily per tile, so only the contrast mean
+            # (taken from the crop instead of the enlarged image) is computed here
+            self.tiled = True
+            self.processed_img = None
+            with self.profiler.stage("enhance"):
+                self.contrast_mean = engine.contrast_mean(self.cropped_img, self.brightness_var.get())
+            return
+        self.tiled = False
+        with self.profiler.stage("resize"):
+            img = engine.scale_image(self.cropped_img, scale)
+        self.processed_img = self.enhance(img)
+
+    def enhance(self, img, contrast_mean=None):
+        with self.profiler.stage("to_pil"):
+            pil_img = Image.fromarray(img)
+        with self.profiler.stage("enhance"):
+            pil_img = engine.adjust_pil_image(pil_img, self.brightness_var.get(), self.contrast_var.get(), contrast_mean)
+        with self.profiler.stage("to_array"):
+            return np.array(pil_img)
     
     def rotate_image(self, angle):
         if self.cropped_img is not None:
             self.push_history()
-            img = self.cropped_img
-            h, w = img.shape[:2]
-            center = (w//2, h//2)
-            rot_mat = cv2.getRotationMatrix2D(center, angle, 1.0)
-            rotated = cv2.warpAffine(img, rot_mat, (w, h), flags=cv2.INTER_CUBIC, borderMode=cv2.BORDER_REPLICATE)
-            self.cropped_img = rotated
+            self.cropped_img = engine.rotate_image(self.cropped_img, angle)
             self.apply_adjustments()
             self.update_displays()
     
@@ -310,10 +594,18 @@ class ImageEditor:
             self.restore_state(next_state)
     
     def save_image(self):
-        if self.processed_img is not None:
+        if self.full_loader is not None:
+            # Only the downscaled preview is loaded yet (Ctrl+S bypasses the disabled button)
+            self.status_bar.config(text="Please wait, loading full resolution...")
+            return
+        if self.save_task is not None:
+            self.status_bar.config(text="A save is already in progress")
+            return
+        if self.processed_img is not None or self.tiled:
             filetypes = [
                 ("PNG Files", "*.png"),
                 ("JPEG Files", "*.jpg"),
+                ("WebP Files", "*.webp"),
                 ("BMP Files", "*.bmp"),
                 ("All Files", "*.*")
             ]
@@ -323,12 +615,66 @@ class ImageEditor:
                 title="Save Image"
             )
             if path:
-                try:
-                    save_img = cv2.cvtColor(self.processed_img, cv2.COLOR_RGB2BGR)
-                    cv2.imwrite(path, save_img)
-                    self.status_bar.config(text=f"Image saved: {path}")
-                except Exception as e:
-                    self.status_bar.config(text=f"Save failed: {str(e)}")
+                # Rendering, color conversion and encoding all run on a worker thread
+                options = {
+                    "png_compression": self.png_compression_var.get(),
+                    "jpeg_quality": self.jpeg_quality_var.get(),
+                    "jpeg_progressive": self.jpeg_progressive_var.get(),
+                    "webp_quality": self.webp_quality_var.get()
+                }
+                self.save_task = engine.BackgroundTask(
+                    self.write_image, path, self.capture_render(), options, self.atomic_save_var.get()
+                )
+                self.save_btn.state(["disabled"])
+                self.check_save()
+
+    @staticmethod
+    def write_image(path, render, options, atomic):
+        engine.save_image(path, render(), options, atomic)
+        return path
+
+    def capture_render(self):
+        # Snapshot of everything needed to produce the full image without touching Tk
+        if not self.tiled:
+            img = self.processed_img
+            return lambda: img
+        cropped, size, mean = self.cropped_img, self.processed_size, self.contrast_mean
+        brightness, contrast = self.brightness_var.get(), self.contrast_var.get()
+        def render():
+            img = engine.scale_region(cropped, size, 0, 0, *size)
+            return engine.adjust_image(img, brightness, contrast, mean)
+        return render
+
+    def check_save(self):
+        task = self.save_task
+        path = task.args[0]
+        if not task.poll():
+            self.status_bar.config(text=f"Saving {os.path.basename(path)}... {task.elapsed():.1f}s")
+            self.root.after(100, self.check_save)
+            return
+        self.save_task = None
+        self.save_btn.state(["!disabled"])
+        if task.error is not None:
+            self.status_bar.config(text=f"Save failed: {str(task.error)}")
+        else:
+            self.status_bar.config(text=f"Image saved: {path} ({task.elapsed():.1f}s)")
+
+    def show_save_options(self):
+        dialog = tk.Toplevel(self.root)
+        dialog.title("Save Options")
+        dialog.transient(self.root)
+        dialog.resizable(False, False)
+        rows = [
+            ("PNG compression (0-9)", ttk.Spinbox(dialog, from_=0, to=9, textvariable=self.png_compression_var, width=5)),
+            ("JPEG quality (0-100)", ttk.Spinbox(dialog, from_=0, to=100, textvariable=self.jpeg_quality_var, width=5)),
+            ("Progressive JPEG", ttk.Checkbutton(dialog, variable=self.jpeg_progressive_var)),
+            ("WebP quality (1-100, >100 lossless)", ttk.Spinbox(dialog, from_=1, to=101, textvariable=self.webp_quality_var, width=5)),
+            ("Write via temporary file", ttk.Checkbutton(dialog, variable=self.atomic_save_var))
+        ]
+        for row, (text, widget) in enumerate(rows):
+            ttk.Label(dialog, text=text).grid(row=row, column=0, sticky="w", padx=10, pady=4)
+            widget.grid(row=row, column=1, sticky="w", padx=10, pady=4)
+        ttk.Button(dialog, text="Close", command=dialog.destroy).grid(row=len(rows), column=0, columnspan=2, pady=8)
 
 if __name__ == "__main__":
     root = tk.Tk()
@@ -13,6 +13,32 @@ CONTROLS:
 * The game features a dynamic camera that follows the hunter, allowing continuous forward 
 movement without restriction from the right-edge boundary.
 
+COMMAND LINE OPTIONS:
+* --stress 3000: Keeps 3000 monsters alive across the world, fires every frame and
+  prints the average update/collision time and frame time once per second.
+* --dirty: Dirty-rectangle rendering. While the camera is still, only the areas
+  that changed are repainted and sent to the display; scrolling redraws everything.
+* --profile [--profile-csv FILE]: Starts with the performance overlay shown, logs
+  a timing summary every second and writes per-frame timings to FILE on exit.
+* F3 toggles the performance overlay, F4 exports recorded frame timings as CSV
+  (frames are recorded with --profile/--profile-csv or once F3 has been pressed).
+* --record FILE [--seed 1]: Records the random seed and every step's input to FILE.
+* --replay FILE [--headless]: Plays a recording back exactly, rendered or headless
+  as fast as possible, and checks the final state against the recording.
+* --sim-radius 400: Only monsters, bullets and collectibles within 400 pixels of the
+  screen (and in the spawn band right of it) are updated; those further ahead wait
+  frozen and those left behind despawn.
+  Sprites outside the screen are never drawn, with or without this option.
+* --bench-entities: Finds how many monsters the sprite classes and a NumPy array
+  model of them (EntityWorld, benchmark only; the game always uses the sprites)
+  can update and collide within one 60 FPS frame.
+* --simulate 100000 [--seed 1]: Runs the game logic headlessly (SDL dummy drivers,
+  no drawing, no frame cap) with a scripted player and prints the outcome and
+  simulated frames per second. Useful for balance runs and regression checks.
+* --simulate 20000 --envs 16 [--workers 4] [--policy random]: Steps 16 independent
+  games (GameEnv, a gym-style reset/step/observation wrapper) in worker processes
+  and reports the aggregate frames per second.
+
 GAME MECHANICS:
 1. SURVIVAL SYSTEM:
 * Start with 5 health points and 3 lives
@@ -47,18 +73,36 @@ GAME MECHANICS:
 
 """
 
+import argparse
+import base64
+import csv
+import hashlib
+import io
+import json
+import os
+import queue
+import threading
+import zlib
 import pygame
 import random
 import math
+import time
+from collections import OrderedDict, deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
-pygame.init()
+try:
+    import numpy as np
+except ImportError:  # Only the array entity model (EntityArrays) needs NumPy
+    np = None
 
 # --- Constants ---
 SCREEN_WIDTH = 900
 SCREEN_HEIGHT = 550
 WORLD_WIDTH = 2700  # Extended world width for camera
 FPS = 60
+STEP_SECONDS = 1 / FPS     # Fixed simulation timestep: one step() is one 60 FPS frame
+MAX_CATCH_UP_STEPS = 5     # Steps run at most per rendered frame when rendering falls behind
 GROUND_HEIGHT = SCREEN_HEIGHT - 50
 
 # Level score thresholds
@@ -66,49 +110,247 @@ LEVEL1_SCORE = 100
 LEVEL2_SCORE = 200
 LEVEL3_SCORE = 400
 
-# --- Setup screen BEFORE loading images ---
-screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-pygame.display.set_caption("Monster Hunter")
-clock = pygame.time.Clock()
+# Replay file format version
+REPLAY_VERSION = 1
+
+# Frame profiler: phases in the order they run within a frame
+PROFILE_PHASES = ["events", "spawn", "update", "camera", "collision",
+                  "background", "sprites", "hud", "overlay", "flip"]
+PROFILE_HISTORY = 600        # Frames used for averages and 1%/0.1% lows (10 seconds)
+PROFILE_MAX_ROWS = 200000    # Per-frame rows kept for CSV export
+
+# Audio: low-latency mixer and channels reserved per sound category, so a
+# burst of monster hits cannot cut off the player's own sounds
+MIXER_FREQUENCY = 44100
+MIXER_BUFFER = 512          # Samples per buffer, about 12 ms at 44.1 kHz
+SOUND_CHANNELS = {"player": 2, "weapon": 3, "impact": 4, "pickup": 2}
+SOUND_THROTTLE_STEPS = 4    # The same sound starts at most once per this many steps
+SOUND_SAMPLE_STEPS = 6      # Channel utilization is sampled every this many steps
+
+# Collision broadphase: uniform grid of columns over the world x axis
+HASH_CELL_SIZE = 128
+HASH_CELLS = WORLD_WIDTH // HASH_CELL_SIZE + 1
+HASH_MIN_SPRITES = 1000  # Below this many sprites or queries per frame, the
+HASH_MIN_QUERIES = 16    # group is one column that collidelistall scans in C
+
+# Band right of the screen where monsters and collectibles spawn (up to 100 px
+# plus the widest sprite); a simulation radius never freezes sprites in it
+SPAWN_MARGIN = 100 + 120
 
 # Assets directory
 ASSETS = Path(__file__).parent / "Assets"
-
-# Load image helper
-def load_img(name, scale=None):
-    img = pygame.image.load(ASSETS / name).convert_alpha()
-    if scale:
-        img = pygame.transform.scale(img, scale)
+# Pre-scaled images as raw RGBA, named by source file hash and target size, so
+# a changed asset or size simply misses the cache
+ASSET_CACHE = Path(__file__).parent / ".asset_cache"
+
+# Images by name: file, scaled size, alpha, first level that uses it (later
+# levels can be streamed in). Backgrounds go into BG_LEVELS, the rest into IMAGES
+IMAGE_ASSETS = {
+    "bg_level1": ("bg_level1.png", (SCREEN_WIDTH, SCREEN_HEIGHT), False, 0),
+    "player": ("player.png", (100, 100), True, 0),
+    "enemy": ("enemy.png", (120, 120), True, 0),
+    "bullet": ("bullet.png", (15, 7), True, 0),
+    "collect_health": ("collect_health.png", (40, 40), True, 0),
+    "collect_life": ("collect_life.png", (40, 40), True, 0),
+    "collect_score": ("collect_score.png", (40, 40), True, 0),
+    "bg_level2": ("bg_level2.png", (SCREEN_WIDTH, SCREEN_HEIGHT), False, 1),
+    "advanced_enemy": ("advanced_enemy.png", (100, 100), True, 1),
+    "bg_level3": ("bg_level3.png", (SCREEN_WIDTH, SCREEN_HEIGHT), False, 2),
+    "boss": ("boss.png", (200, 200), True, 2),
+}
+IMAGES = {}  # Converted sprite images by name, filled by load_assets
+
+# Decode and scale an image without touching the display, so it is safe to
+# call from a worker thread. The result still has to be converted.
+def load_scaled(name, size):
+    data = (ASSETS / name).read_bytes()
+    digest = hashlib.sha1(data).hexdigest()[:16]
+    cached = ASSET_CACHE / f"{Path(name).stem}_{size[0]}x{size[1]}_{digest}.rgba"
+    try:
+        return pygame.image.frombytes(cached.read_bytes(), size, "RGBA")
+    except (OSError, ValueError):
+        pass  # Not cached yet, or a truncated file
+    img = pygame.transform.scale(pygame.image.load(io.BytesIO(data), name), size)
+    try:
+        ASSET_CACHE.mkdir(exist_ok=True)
+        tmp = cached.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_bytes(pygame.image.tobytes(img, "RGBA"))
+        os.replace(tmp, cached)  # Other processes never see a partial file
+    except OSError:
+        pass  # Read-only checkout: keep working without the cache
     return img
 
+# Background helper: two copies of the screen-wide tile side by side, so any
+# scroll offset is covered by a single blit of a SCREEN_WIDTH window
+def make_bg_strip(tile):
+    strip = pygame.Surface((SCREEN_WIDTH * 2, SCREEN_HEIGHT)).convert()
+    strip.blit(tile, (0, 0))
+    strip.blit(tile, (SCREEN_WIDTH, 0))
+    return strip
+
+# Convert a loaded image (main thread only) and publish it under its name.
+# Opaque images are converted without alpha so blits take the fast path
+def install_image(name, img):
+    _, _, alpha, level = IMAGE_ASSETS[name]
+    img = img.convert_alpha() if alpha else img.convert()
+    if name.startswith("bg_level"):
+        BG_LEVELS[level] = make_bg_strip(img)
+    else:
+        IMAGES[name] = img
+
 # Load sounds helper 
 def load_sound(name):
     return pygame.mixer.Sound(str(ASSETS / name))
 
-# --- Load images ---
-BG_LEVELS = [
-    load_img("bg_level1.png", (SCREEN_WIDTH, SCREEN_HEIGHT)),  # Original size, will tile
-    load_img("bg_level2.png", (SCREEN_WIDTH, SCREEN_HEIGHT)),
-    load_img("bg_level3.png", (SCREEN_WIDTH, SCREEN_HEIGHT))
-]
-
-PLAYER_IMG = load_img("player.png", (100, 100))
-ENEMY_IMG = load_img("enemy.png", (120, 120))
-ADV_ENEMY_IMG = load_img("advanced_enemy.png", (100, 100))
-BULLET_IMG = load_img("bullet.png", (15, 7))
-BOSS_IMG = load_img("boss.png", (200, 200))
-COLLECT_HEALTH_IMG = load_img("collect_health.png", (40, 40))
-COLLECT_LIFE_IMG = load_img("collect_life.png", (40, 40))
-COLLECT_SCORE_IMG = load_img("collect_score.png", (40, 40))
-
-# --- Load sounds ---
-SHOOT_SOUND = load_sound("shoot.wav")
-HIT_SOUND = load_sound("player_hit.wav")
-ENEMY_HIT_SOUND = load_sound("enemy_hit.wav")
-COLLECT_SOUND = load_sound("collect.wav")
-JUMP_SOUND = load_sound("jump.mp3")
-pygame.mixer.music.load(str(ASSETS / "bg_music.mp3"))
-pygame.mixer.music.play(-1)
+class AssetStreamer:
+    # Loads later-level images on a background thread; poll() installs them on
+    # the main thread and wait_for_level() blocks until a level's images are in
+    def __init__(self, names):
+        names = sorted(names, key=lambda name: IMAGE_ASSETS[name][3])
+        self.pending = {name: IMAGE_ASSETS[name][3] for name in names}
+        self.ready = queue.Queue()
+        self.thread = threading.Thread(target=self.run, args=(names,), daemon=True)
+        self.thread.start()
+
+    def run(self, names):
+        for name in names:
+            file, size, _, _ = IMAGE_ASSETS[name]
+            try:
+                self.ready.put((name, load_scaled(file, size), None))
+            except Exception as error:  # Re-raised on the main thread
+                self.ready.put((name, None, error))
+
+    @property
+    def done(self):
+        return not self.pending
+
+    def install(self, name, img, error):
+        if error is not None:
+            raise error
+        install_image(name, img)
+        del self.pending[name]
+        if self.done:
+            ADV_ENEMY_POOL.prefill()
+
+    def poll(self):
+        while self.pending:
+            try:
+                self.install(*self.ready.get_nowait())
+            except queue.Empty:
+                return
+
+    def wait_for_level(self, level):
+        while any(first <= level for first in self.pending.values()):
+            self.install(*self.ready.get())
+
+class SoundManager:
+    # Plays sounds by name on their category's reserved channels, skipping
+    # repeats within the throttle window and reusing the oldest busy channel
+    def __init__(self, categories=SOUND_CHANNELS, throttle=SOUND_THROTTLE_STEPS):
+        self.throttle = throttle
+        self.sounds = {}      # Name -> (Sound, category)
+        self.channels = {}    # Category -> reserved Channels
+        self.next_reuse = dict.fromkeys(categories, 0)
+        reserved = sum(categories.values())
+        pygame.mixer.set_num_channels(max(pygame.mixer.get_num_channels(), reserved))
+        pygame.mixer.set_reserved(reserved)  # Sound.play() elsewhere stays off these
+        first = 0
+        for category, count in categories.items():
+            self.channels[category] = [pygame.mixer.Channel(first + i) for i in range(count)]
+            first += count
+        self.step = 0
+        self.last_started = {}  # Name -> step it last started
+        self.played = self.throttled = self.reused = 0
+        self.samples = 0
+        self.busy = dict.fromkeys(categories, 0)  # Busy channels summed over samples
+        self.peak = dict.fromkeys(categories, 0)
+
+    def add(self, name, sound, category):
+        self.sounds[name] = (sound, category)
+
+    def play(self, name):
+        if self.step - self.last_started.get(name, -self.throttle) < self.throttle:
+            self.throttled += 1
+            return
+        self.last_started[name] = self.step
+        sound, category = self.sounds[name]
+        channels = self.channels[category]
+        for channel in channels:
+            if not channel.get_busy():
+                break
+        else:
+            # All busy: channels are reused in turn, so the oldest sound is cut
+            channel = channels[self.next_reuse[category]]
+            self.next_reuse[category] = (self.next_reuse[category] + 1) % len(channels)
+            self.reused += 1
+        channel.play(sound)
+        self.played += 1
+
+    def tick(self):
+        self.step += 1
+        if self.step % SOUND_SAMPLE_STEPS == 0:
+            self.samples += 1
+            for category, channels in self.channels.items():
+                busy = sum(channel.get_busy() for channel in channels)
+                self.busy[category] += busy
+                self.peak[category] = max(self.peak[category], busy)
+
+    def summary(self):
+        # Average and peak busy channels per category, plus play counters
+        usage = " ".join(f"{category} {self.busy[category] / max(1, self.samples):.1f}/{self.peak[category]}/{len(channels)}"
+                         for category, channels in self.channels.items())
+        return (f"audio: busy channels avg/peak/reserved {usage} | played {self.played}, "
+                f"throttled {self.throttled}, reused {self.reused}")
+
+# --- Setup ---
+def init_display(headless=False):
+    # Headless runs use SDL's dummy drivers: no window and no audio device,
+    # but images can still be converted and sounds loaded
+    if headless:
+        os.environ["SDL_VIDEODRIVER"] = "dummy"
+        os.environ["SDL_AUDIODRIVER"] = "dummy"
+    pygame.mixer.pre_init(MIXER_FREQUENCY, -16, 2, MIXER_BUFFER)  # Small buffer: low latency
+    pygame.init()
+    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    pygame.display.set_caption("Monster Hunter")
+    return screen
+
+def load_assets(music=True, stream=False):
+    # Needs a display mode (see init_display) so images can be converted.
+    # With stream=True only level 1 is loaded here and the returned
+    # AssetStreamer brings in the rest; otherwise everything is loaded now.
+    global BG_LEVELS
+    global SOUNDS
+
+    # --- Load images ---
+    BG_LEVELS = [None, None, None]  # Tiles across the world
+    later = []
+    for name, (file, size, _, level) in IMAGE_ASSETS.items():
+        if stream and level > 0:
+            later.append(name)
+        else:
+            install_image(name, load_scaled(file, size))
+    BG_LEVELS = [bg or BG_LEVELS[0] for bg in BG_LEVELS]  # Until streamed in
+    IMAGES["boss_bullet"] = pygame.Surface((8, 8)).convert()  # Shared by every boss bullet
+    IMAGES["boss_bullet"].fill((255, 0, 0))
+
+    # --- Load sounds ---
+    SOUNDS = SoundManager()
+    SOUNDS.add("shoot", load_sound("shoot.wav"), "weapon")
+    SOUNDS.add("hit", load_sound("player_hit.wav"), "player")
+    SOUNDS.add("enemy_hit", load_sound("enemy_hit.wav"), "impact")
+    SOUNDS.add("collect", load_sound("collect.wav"), "pickup")
+    SOUNDS.add("jump", load_sound("jump.mp3"), "player")
+    if music:
+        pygame.mixer.music.load(str(ASSETS / "bg_music.mp3"))
+        pygame.mixer.music.play(-1)
+
+    # Create pooled sprites up front so play does not allocate them; the elite
+    # pool waits for its streamed image
+    for pool in POOLS:
+        if pool is not ADV_ENEMY_POOL or not later:
+            pool.prefill()
+    return AssetStreamer(later) if later else None
 
 # --- Camera Class ---
 class Camera:
@@ -128,18 +370,140 @@ class Camera:
         # Apply camera offset to sprite positions
         return rect.move(-self.offset_x, 0)
 
-    def draw_background(self, surface, bg_image):
-        # Tile background to cover world width
-        x = -self.offset_x % SCREEN_WIDTH
-        for i in range(-1, int(WORLD_WIDTH / SCREEN_WIDTH) + 1):
-            surface.blit(bg_image, (x + i * SCREEN_WIDTH, 0))
+    def view_rect(self):
+        # Visible part of the world (one pixel wider to cover the fractional offset)
+        return pygame.Rect(math.floor(self.offset_x), 0, SCREEN_WIDTH + 1, SCREEN_HEIGHT)
+
+    def draw_background(self, surface, bg_strip):
+        # The background repeats every SCREEN_WIDTH, so the visible part is one
+        # window of the pre-composited two-tile strip
+        x = int(self.offset_x) % SCREEN_WIDTH
+        surface.blit(bg_strip, (0, 0), (x, 0, SCREEN_WIDTH, SCREEN_HEIGHT))
+
+    def restore_background(self, surface, bg_strip, rect):
+        # Repaint only rect (screen coordinates) with the background behind it
+        x = int(self.offset_x) % SCREEN_WIDTH
+        surface.blit(bg_strip, rect, rect.move(x, 0))
+
+# --- Spatial Hash ---
+class SpatialHash:
+    # Collision broadphase for one sprite group: each sprite sits once, in the
+    # column of its left edge, and a column is tested by one collidelistall
+    def __init__(self, cell_size=HASH_CELL_SIZE, cells=HASH_CELLS):
+        self.cell_size = cell_size
+        self.cell_count = cells
+        self.last = cells - 1
+        self.sprites = [[] for _ in range(cells)]
+        self.rects = [[] for _ in range(cells)]
+        self.max_width = 0
+        self.group = None
+
+    def rebuild(self, group, queries):
+        # Called once per frame after movement, before collision checks, with
+        # the number of query() calls to expect. Columns only pay for their
+        # Python-level bucketing with many sprites and many queries
+        self.group = group
+        if len(group) < HASH_MIN_SPRITES or queries < HASH_MIN_QUERIES:
+            self.last = 0
+            self.sprites = [group.sprites()]
+            self.rects = [[sprite.rect for sprite in self.sprites[0]]]
+            return
+        size = self.cell_size
+        last = self.last = self.cell_count - 1
+        sprites = self.sprites = [[] for _ in range(last + 1)]
+        rects = self.rects = [[] for _ in range(last + 1)]
+        max_width = 0
+        for sprite in group:
+            rect = sprite.rect
+            col = rect.left // size
+            col = 0 if col < 0 else last if col > last else col
+            sprites[col].append(sprite)
+            rects[col].append(rect)
+            if rect.width > max_width:
+                max_width = rect.width
+        self.max_width = max_width
+
+    def query(self, rect):
+        # Sprites still in the group whose rect overlaps rect
+        has = self.group.has
+        size, last = self.cell_size, self.last
+        if not last:
+            sprites = self.sprites[0]
+            return [sprites[i] for i in rect.collidelistall(self.rects[0]) if has(sprites[i])]
+        first = max(0, min((rect.left - self.max_width) // size, last))
+        hits = []
+        for col in range(first, max(0, min(rect.right // size, last)) + 1):
+            rects = self.rects[col]
+            if rects:
+                sprites = self.sprites[col]
+                hits.extend(sprites[i] for i in rect.collidelistall(rects) if has(sprites[i]))
+        return hits
+
+# --- Sprite Pools ---
+class SpritePool:
+    # Free list for one sprite class; sprites return when they leave their last group
+    def __init__(self, cls, size, default_args):
+        self.cls = cls
+        self.size = size
+        self.default_args = default_args  # Constructor arguments used by prefill()
+        self.free = []
+        self.created = 0  # Instances allocated so far
+        cls.pool = self
+
+    def prefill(self):
+        # Constructors draw random numbers; keep the game's random sequence
+        # independent of when (or whether) a pool is filled
+        state = random.getstate()
+        while len(self.free) < self.size:
+            self.free.append(self.new(*self.default_args))
+        random.setstate(state)
+
+    def new(self, *args):
+        self.created += 1
+        return self.cls(*args)
+
+    def acquire(self, *args):
+        if self.free:
+            sprite = self.free.pop()
+            sprite.reset(*args)
+            return sprite
+        return self.new(*args)
+
+    def release(self, sprite):
+        # Extra instances beyond size are left to the garbage collector
+        if len(self.free) < self.size:
+            self.free.append(sprite)
+
+class PooledSprite(pygame.sprite.Sprite):
+    # State is set in reset() so a pool can reuse the instance
+    pool = None
+
+    def __init__(self, *args):
+        super().__init__()
+        self.reset(*args)
+
+    def reset(self, *args):
+        raise NotImplementedError
+
+    # Sprite.kill() clears its groups directly while Group.remove()/empty() go
+    # through remove_internal(), so both hand the sprite back when it is dead
+    def kill(self):
+        was_alive = self.alive()
+        super().kill()
+        if was_alive and self.pool is not None:
+            self.pool.release(self)
+
+    def remove_internal(self, group):
+        super().remove_internal(group)
+        if not self.alive() and self.pool is not None:
+            self.pool.release(self)
 
 # --- Game Classes ---
 
 class Player(pygame.sprite.Sprite):
     def __init__(self):
         super().__init__()
-        self.image = PLAYER_IMG
+        self.image = IMAGES["player"]
         self.rect = self.image.get_rect(midbottom=(100, GROUND_HEIGHT))
         self.speed = 5
         self.max_health = 5
@@ -155,15 +519,15 @@ class Player(pygame.sprite.Sprite):
         self.jump_velocity = 0
         self.on_ground = True
 
-    def update(self, keys):
+    def update(self, inputs):
         # Horizontal movement controls
-        if keys[pygame.K_LEFT] and self.rect.left > 0:
+        if inputs.left and self.rect.left > 0:
             self.rect.x -= self.speed
-        if keys[pygame.K_RIGHT] and self.rect.right < WORLD_WIDTH:
+        if inputs.right and self.rect.right < WORLD_WIDTH:
             self.rect.x += self.speed
         
         # Jumping control
-        if keys[pygame.K_UP] and self.on_ground:
+        if inputs.up and self.on_ground:
             self.jump()
         
         # Apply gravity and jumping physics
@@ -183,7 +547,7 @@ class Player(pygame.sprite.Sprite):
             self.jumping = True
             self.on_ground = False
             self.jump_velocity = self.jump_height
-            JUMP_SOUND.play()
+            SOUNDS.play("jump")
 
     def draw_health_bar(self, surface, camera):
         # Draw health bar above player with camera offset
@@ -196,17 +560,16 @@ class Player(pygame.sprite.Sprite):
         fill_rect = camera.apply(fill_rect)
         pygame.draw.rect(surface, (255,0,0), fill_rect)
         pygame.draw.rect(surface, (255,255,255), outline_rect, 1)
+        return outline_rect
 
-class BossBullet(pygame.sprite.Sprite):
-    def __init__(self, pos):
-        super().__init__()
-        self.image = pygame.Surface((8, 8))
-        self.image.fill((255, 0, 0))
+class BossBullet(PooledSprite):
+    def reset(self, pos):
+        self.image = IMAGES["boss_bullet"]
         self.rect = self.image.get_rect(center=pos)
         self.speed = 7
         self.direction = -1  # Move left
 
-    def update(self):
+    def update(self, camera):
         self.rect.x += self.direction * self.speed
         if self.rect.right < camera.offset_x:
             self.kill()
@@ -214,7 +577,7 @@ class BossBullet(pygame.sprite.Sprite):
 class Boss(pygame.sprite.Sprite):
     def __init__(self, camera_offset):
         super().__init__()
-        self.image = BOSS_IMG
+        self.image = IMAGES["boss"]
         self.rect = self.image.get_rect(midbottom=(camera_offset + SCREEN_WIDTH + 50, GROUND_HEIGHT))  # x=offset_x+950
         self.max_health = 500
         self.health = self.max_health
@@ -232,7 +595,7 @@ class Boss(pygame.sprite.Sprite):
         self.shoot_timer = 0
         self.bullets = pygame.sprite.Group()
 
-    def update(self):
+    def update(self, camera):
         # Horizontal movement
         if self.rect.left > camera.offset_x + SCREEN_WIDTH - 200:  # Move to x=offset_x+700
             self.rect.x -= self.speed
@@ -262,7 +625,7 @@ class Boss(pygame.sprite.Sprite):
 
     def shoot(self):
         for i in range(-1, 2):
-            bullet = BossBullet((self.rect.left, self.rect.bottom - 50 + i*10))
+            bullet = BOSS_BULLET_POOL.acquire((self.rect.left, self.rect.bottom - 50 + i*10))
             self.bullets.add(bullet)
 
     def draw_health_bar(self, surface):
@@ -274,23 +637,22 @@ class Boss(pygame.sprite.Sprite):
         fill_rect = pygame.Rect(SCREEN_WIDTH - bar_width - 10, 10, fill, bar_height)
         pygame.draw.rect(surface, (0,255,0), fill_rect)
         pygame.draw.rect(surface, (255,255,255), outline_rect, 2)
+        return outline_rect
 
-class Enemy(pygame.sprite.Sprite):
-    def __init__(self, camera_offset):
-        super().__init__()
-        self.image = ENEMY_IMG
+class Enemy(PooledSprite):
+    def reset(self, camera_offset):
+        self.image = IMAGES["enemy"]
         self.rect = self.image.get_rect(midbottom=(camera_offset + SCREEN_WIDTH + random.randint(0, 100), GROUND_HEIGHT))
         self.speed = random.randint(5, 8)
 
-    def update(self):
+    def update(self, camera):
         self.rect.x -= self.speed
         if self.rect.right < camera.offset_x:
             self.kill()
 
-class AdvancedEnemy(pygame.sprite.Sprite):
-    def __init__(self, camera_offset):
-        super().__init__()
-        self.image = ADV_ENEMY_IMG
+class AdvancedEnemy(PooledSprite):
+    def reset(self, camera_offset):
+        self.image = IMAGES["advanced_enemy"]
         self.rect = self.image.get_rect(midbottom=(camera_offset + SCREEN_WIDTH + random.randint(0, 100), GROUND_HEIGHT))
         self.speed = random.randint(8, 12)
         # Health properties
@@ -304,7 +666,7 @@ class AdvancedEnemy(pygame.sprite.Sprite):
         self.on_ground = True
         self.jump_timer = random.randint(30, 60)
 
-    def update(self):
+    def update(self, camera):
         # Horizontal movement during jumping and on ground
         self.rect.x -= self.speed
         
@@ -346,29 +708,28 @@ class AdvancedEnemy(pygame.sprite.Sprite):
         fill_rect = camera.apply(fill_rect)
         pygame.draw.rect(surface, (255,0,0), fill_rect)
         pygame.draw.rect(surface, (255,255,255), outline_rect, 1)
+        return outline_rect
 
-class Bullet(pygame.sprite.Sprite):
-    def __init__(self, pos):
-        super().__init__()
-        self.image = BULLET_IMG
+class Bullet(PooledSprite):
+    def reset(self, pos):
+        self.image = IMAGES["bullet"]
         self.rect = self.image.get_rect(center=pos)
         self.speed = 10
 
-    def update(self):
+    def update(self, camera):
         self.rect.x += self.speed
         if self.rect.left > camera.offset_x + SCREEN_WIDTH:
             self.kill()
 
-class Collectible(pygame.sprite.Sprite):
-    def __init__(self, camera_offset, kind):
-        super().__init__()
+class Collectible(PooledSprite):
+    def reset(self, camera_offset, kind):
         self.kind = kind
         if kind == 'health':
-            self.image = COLLECT_HEALTH_IMG
+            self.image = IMAGES["collect_health"]
         elif kind == 'life':
-            self.image = COLLECT_LIFE_IMG
+            self.image = IMAGES["collect_life"]
         else:
-            self.image = COLLECT_SCORE_IMG
+            self.image = IMAGES["collect_score"]
         
         # Position collectibles at jumpable heights
         max_jump_height = 200
@@ -377,289 +738,1226 @@ class Collectible(pygame.sprite.Sprite):
         self.rect = self.image.get_rect(midbottom=(camera_offset + SCREEN_WIDTH + random.randint(0, 100), random.randint(min_height, max_height)))
         self.speed = 4
 
-    def update(self):
+    def update(self, camera):
         self.rect.x -= self.speed
         if self.rect.right < camera.offset_x:
             self.kill()
 
-# --- Game Groups ---
-player = Player()
-player_group = pygame.sprite.GroupSingle(player)
-enemy_group = pygame.sprite.Group()
-advanced_enemy_group = pygame.sprite.Group()
-bullet_group = pygame.sprite.Group()
-collectibles = pygame.sprite.Group()
-boss_group = pygame.sprite.Group()
-boss_bullets = pygame.sprite.Group()
-
-# --- Camera ---
-camera = Camera()
-
-# --- Game Variables ---
-spawn_timer = 0
-collect_timer = 0
-boss_spawned = False
-level = 0
-level_cleared = False
-game_over = False
-win_message_timer = 0
-game_timer = 0  # Track game time for guide message
-player_idle_timer = 0  # Track player idle time
-
-# Font for UI and messages
-font = pygame.font.SysFont(None, 36)
-small_font = pygame.font.SysFont(None, 28)
-big_font = pygame.font.SysFont(None, 50)
-
-# --- Functions for showing messages ---
-def show_message(text, duration=180):
-    global win_message_timer, win_message
-    win_message = big_font.render(text, True, (255, 255, 255))
-    win_message_timer = duration
-
-# --- Game Loop ---
-running = True
-while running:
-    clock.tick(FPS)
+# Pool sizes cover the normal peak number of live sprites of each kind
+BULLET_POOL = SpritePool(Bullet, 64, ((0, 0),))
+BOSS_BULLET_POOL = SpritePool(BossBullet, 48, ((0, 0),))
+ENEMY_POOL = SpritePool(Enemy, 32, (0,))
+ADV_ENEMY_POOL = SpritePool(AdvancedEnemy, 32, (0,))
+COLLECTIBLE_POOL = SpritePool(Collectible, 16, (0, 'score'))
+POOLS = [BULLET_POOL, BOSS_BULLET_POOL, ENEMY_POOL, ADV_ENEMY_POOL, COLLECTIBLE_POOL]
+
+# --- Array entity model (for --bench-entities, needs NumPy) ---
+# Kinds handled by EntityArrays: size, speed range in pixels per step (negative
+# moves left), jumps like AdvancedEnemy, health. Mirrors the sprite classes.
+ENTITY_KINDS = {
+    "enemy": ((120, 120), (-8, -5), False, 1),
+    "advanced_enemy": ((100, 100), (-12, -8), True, 2),
+    "bullet": ((15, 7), (10, 10), False, 1),
+    "boss_bullet": ((8, 8), (-7, -7), False, 1),
+}
+ENTITY_FIELDS = (("x", "f8"), ("y", "f8"), ("vx", "f8"), ("vy", "f8"),
+                 ("jumping", "?"), ("jump_timer", "i4"), ("health", "i4"))
+
+class EntityArrays:
+    # One kind of monster or projectile as NumPy arrays, live entities packed
+    # at the front, all updated with a few array operations
+    JUMP_HEIGHT = 15  # Same jump as AdvancedEnemy
+    GRAVITY = 0.8
+
+    def __init__(self, kind, capacity=256, rng=None):
+        (self.w, self.h), self.speed_range, self.jumps, self.max_health = ENTITY_KINDS[kind]
+        self.kind = kind
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.count = 0
+        for name, dtype in ENTITY_FIELDS:
+            setattr(self, name, np.zeros(capacity, dtype))
+
+    def __len__(self):
+        return self.count
+
+    def grow(self, capacity):
+        for name, dtype in ENTITY_FIELDS:
+            array = np.zeros(capacity, dtype)
+            array[:self.count] = getattr(self, name)[:self.count]
+            setattr(self, name, array)
+
+    def spawn(self, x, y):
+        # x, y: top-left positions (arrays or scalars)
+        x = np.atleast_1d(np.asarray(x, dtype="f8"))
+        n = len(x)
+        start, end = self.count, self.count + n
+        if end > len(self.x):
+            self.grow(max(end, 2 * len(self.x)))
+        new = slice(start, end)
+        low, high = self.speed_range
+        self.x[new] = x
+        self.y[new] = y
+        self.vx[new] = self.rng.integers(low, high + 1, n)
+        self.vy[new] = 0
+        self.jumping[new] = False
+        self.jump_timer[new] = self.rng.integers(30, 61, n)
+        self.health[new] = self.max_health
+        self.count = end
+
+    def update(self, camera_x):
+        n = self.count
+        x, y = self.x[:n], self.y[:n]
+        x += self.vx[:n]
+        if self.jumps:
+            # Same rules as AdvancedEnemy.update, for every entity at once
+            jumping, vy, timer = self.jumping[:n], self.vy[:n], self.jump_timer[:n]
+            timer += 1
+            start = ~jumping & (timer >= 60)
+            jumping |= start
+            vy[start] = self.JUMP_HEIGHT
+            timer[start] = 0
+            y -= np.where(jumping, vy, 0.0)
+            vy -= np.where(jumping, self.GRAVITY, 0.0)
+            landed = jumping & (y + self.h >= GROUND_HEIGHT)
+            y[landed] = GROUND_HEIGHT - self.h
+            jumping &= ~landed
+            vy[landed] = 0
+            timer[landed] = self.rng.integers(30, 61, int(landed.sum()))
+        # Despawn like the sprites: left of the view, or right of it for bullets
+        gone = x + self.w < camera_x
+        if self.speed_range[0] > 0:
+            gone |= x > camera_x + SCREEN_WIDTH
+        self.remove(gone)
+
+    def remove(self, mask):
+        # Packs the entities not in mask (length count) to the front
+        keep = ~mask
+        kept = int(keep.sum())
+        if kept == self.count:
+            return
+        for name, _ in ENTITY_FIELDS:
+            array = getattr(self, name)
+            array[:kept] = array[:self.count][keep]
+        self.count = kept
+
+    def mask(self, indices):
+        mask = np.zeros(self.count, bool)
+        mask[indices] = True
+        return mask
+
+    def touching(self, rect):
+        # Mask of entities overlapping a pygame Rect
+        x, y = self.x[:self.count], self.y[:self.count]
+        return (x < rect.right) & (rect.left < x + self.w) & (y < rect.bottom) & (rect.top < y + self.h)
+
+    def pairs(self, other):
+        # Overlapping (self, other) index pairs: other sorted on x, each entity only
+        # checks the run found by searchsorted
+        n, m = self.count, other.count
+        if not n or not m:
+            empty = np.zeros(0, np.intp)
+            return empty, empty
+        order = np.argsort(other.x[:m], kind="stable")
+        left = other.x[:m][order]
+        x = self.x[:n]
+        first = np.searchsorted(left, x - other.w, "right")
+        last = np.searchsorted(left, x + self.w, "left")
+        lengths = last - first
+        i = np.repeat(np.arange(n), lengths)
+        runs = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        j = order[np.repeat(first, lengths) + runs]
+        hit = (self.y[i] < other.y[j] + other.h) & (other.y[j] < self.y[i] + self.h)
+        return i[hit], j[hit]
+
+class EntityWorld:
+    # Game.check_collisions on EntityArrays, for --bench-entities only; hits in
+    # a step are simultaneous, so two bullets touching one monster are both spent
+    def __init__(self, seed=None):
+        rng = np.random.default_rng(seed)
+        self.enemies = EntityArrays("enemy", rng=rng)
+        self.advanced_enemies = EntityArrays("advanced_enemy", rng=rng)
+        self.bullets = EntityArrays("bullet", rng=rng)
+        self.boss_bullets = EntityArrays("boss_bullet", rng=rng)
+        self.kinds = [self.enemies, self.advanced_enemies, self.bullets, self.boss_bullets]
+
+    def __len__(self):
+        return sum(len(arrays) for arrays in self.kinds)
+
+    def step(self, camera_x, player_rect, on_ground=True):
+        # Returns (score gained, damage taken by the player)
+        for arrays in self.kinds:
+            arrays.update(camera_x)
+        enemies, advanced, bullets = self.enemies, self.advanced_enemies, self.bullets
+
+        bullet_hits, enemy_hits = bullets.pairs(enemies)
+        adv_bullet_hits, adv_hits = bullets.pairs(advanced)
+        score = 5 * len(np.unique(bullet_hits))
+        advanced.health[:advanced.count] -= np.bincount(adv_hits, minlength=advanced.count).astype("i4")
+        killed = advanced.health[:advanced.count] <= 0
+        score += 5 * int(killed.sum())
+        bullets.remove(bullets.mask(bullet_hits) | bullets.mask(adv_bullet_hits))
+        enemies.remove(enemies.mask(enemy_hits))
+        advanced.remove(killed)
+
+        damage = 0
+        if on_ground:
+            # As in Game, elites are only checked when no regular monster touches
+            for arrays in (enemies, advanced):
+                hit = arrays.touching(player_rect)
+                if hit.any():
+                    arrays.remove(hit)
+                    damage += 2
+                    break
+        hit = self.boss_bullets.touching(player_rect)
+        damage += int(hit.sum())
+        self.boss_bullets.remove(hit)
+        return score, damage
+
+# --- Frame Profiler ---
+class FrameProfiler:
+    # Per-frame phase timings (work time, without the clock.tick() wait); CSV
+    # rows are only kept while record is set
+    def __init__(self, visible=False, record=False):
+        self.visible = visible            # Overlay shown on screen
+        self.record = record              # Keep per-frame rows for export_csv
+        self.history = deque(maxlen=PROFILE_HISTORY)  # Recent frame times (ms)
+        self.rows = deque(maxlen=PROFILE_MAX_ROWS)    # Rows for CSV export
+        self.phases = dict.fromkeys(PROFILE_PHASES, 0.0)
+        self.frame_start = self.last = time.perf_counter()
+        self.frames = 0
+        self.last_row = None
+
+    def start_frame(self):
+        self.phases = dict.fromkeys(PROFILE_PHASES, 0.0)
+        self.frame_start = self.last = time.perf_counter()
+
+    def mark(self, phase):
+        now = time.perf_counter()
+        self.phases[phase] += now - self.last
+        self.last = now
+
+    def end_frame(self, counts):
+        total = (time.perf_counter() - self.frame_start) * 1000
+        self.frames += 1
+        self.history.append(total)
+        row = {"frame": self.frames, "total_ms": round(total, 3)}
+        row.update({f"{k}_ms": round(v * 1000, 3) for k, v in self.phases.items()})
+        row.update(counts)
+        if self.record:
+            self.rows.append(row)
+        self.last_row = row
+
+    def lows(self):
+        # Average of the slowest 1% and 0.1% of recent frames (ms)
+        times = sorted(self.history, reverse=True)
+        if not times:
+            return 0.0, 0.0
+        def worst(fraction):
+            n = max(1, int(len(times) * fraction))
+            return sum(times[:n]) / n
+        return worst(0.01), worst(0.001)
+
+    def summary_lines(self):
+        row = self.last_row
+        if row is None:
+            return []
+        avg = sum(self.history) / len(self.history)
+        low1, low01 = self.lows()
+        phases = [f"{k} {row[k + '_ms']:.2f}" for k in PROFILE_PHASES]
+        counts = [f"{k} {v}" for k, v in row.items() if not k.endswith("_ms") and k != "frame"]
+        return [
+            f"frame {row['total_ms']:.2f} ms | avg {avg:.2f} | 1% low {low1:.2f} | 0.1% low {low01:.2f}",
+            " ".join(phases[:5]),
+            " ".join(phases[5:]),
+            " ".join(counts)
+        ]
+
+    def export_csv(self, path):
+        if not self.rows:
+            return 0
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=list(self.rows[0].keys()))
+            writer.writeheader()
+            writer.writerows(self.rows)
+        return len(self.rows)
+
+# --- Input ---
+# Player input for one simulation step: held keys plus keys pressed during the step
+Inputs = namedtuple("Inputs", "left right up shoot restart", defaults=(False,) * 5)
+
+def read_inputs(events):
     keys = pygame.key.get_pressed()
-
-    # Events
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            running = False
-
-        if event.type == pygame.KEYDOWN:
-            if event.key == pygame.K_f and not level_cleared and not game_over:
-                bullet = Bullet(player.rect.midright)
-                bullet_group.add(bullet)
-                SHOOT_SOUND.play()
-
-            if event.key == pygame.K_r and (level_cleared or game_over):
-                player.health = player.max_health
-                player.lives = player.max_lives
-                player.score = 0
-                level = 0
-                level_cleared = False
-                game_over = False
-                boss_spawned = False
-                enemy_group.empty()
-                advanced_enemy_group.empty()
-                bullet_group.empty()
-                collectibles.empty()
-                boss_group.empty()
-                boss_bullets.empty()
-                player.rect.midbottom = (100, GROUND_HEIGHT)
-                camera.offset_x = 0  # Reset camera
-                game_timer = 0
-                player_idle_timer = 0
-                spawn_timer = 0
-                collect_timer = 0
-                show_message("")
-
-    # Track game time and player idle
-    if not game_over and not level_cleared:
-        game_timer += 1
-        if not keys[pygame.K_RIGHT] and player.rect.right < 150:
-            player_idle_timer += 1
-        else:
-            player_idle_timer = 0
-
-    # Only update game if not game over and not level cleared
-    if not game_over and not level_cleared:
-        spawn_timer += 1
-        if level < 2:  # Stop collectibles in level 3 after victory
-            collect_timer += 1
-
-        if level == 0:
-            if spawn_timer > 30:  # 0.5 seconds
-                enemy_group.add(Enemy(camera.offset_x))
-                spawn_timer = 0
-        elif level == 1:
-            if spawn_timer > 50:
-                advanced_enemy_group.add(AdvancedEnemy(camera.offset_x))
-                spawn_timer = 0
-        elif level == 2:
-            if spawn_timer > 50:
-                advanced_enemy_group.add(AdvancedEnemy(camera.offset_x))
-                spawn_timer = 0
-
-        if collect_timer > 300 and (not level_cleared or level < 2):
-            collect_timer = 0
+    pressed = {event.key for event in events if event.type == pygame.KEYDOWN}
+    return Inputs(
+        left=keys[pygame.K_LEFT],
+        right=keys[pygame.K_RIGHT],
+        up=keys[pygame.K_UP],
+        shoot=pygame.K_f in pressed,
+        restart=pygame.K_r in pressed
+    )
+
+# --- Replays ---
+def pack_inputs(inputs):
+    # One byte per step: bit i is Inputs field i
+    return sum(1 << i for i, pressed in enumerate(inputs) if pressed)
+
+def unpack_inputs(code):
+    return Inputs(*(bool(code >> i & 1) for i in range(len(Inputs._fields))))
+
+class Replay:
+    # Seed and per-step inputs of a session, plus its final state for checking
+    # a playback; saved as JSON with the inputs compressed
+    def __init__(self, seed, stress=0, inputs=b"", final_state=None, sim_radius=None):
+        self.seed = seed
+        self.stress = stress  # --stress count active while recording
+        self.sim_radius = sim_radius  # --sim-radius active while recording
+        self.inputs = bytearray(inputs)
+        self.final_state = final_state
+
+    def record(self, inputs):
+        self.inputs.append(pack_inputs(inputs))
+
+    def __len__(self):
+        return len(self.inputs)
+
+    def __iter__(self):
+        return (unpack_inputs(code) for code in self.inputs)
+
+    def save(self, path, game):
+        self.final_state = game_fingerprint(game)
+        data = {
+            "version": REPLAY_VERSION,
+            "seed": self.seed,
+            "stress": self.stress,
+            "sim_radius": self.sim_radius,
+            "steps": len(self.inputs),
+            "final_state": self.final_state,
+            "inputs": base64.b64encode(zlib.compress(bytes(self.inputs), 9)).decode("ascii")
+        }
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != REPLAY_VERSION:
+            raise ValueError(f"Unsupported replay version: {data.get('version')}")
+        inputs = zlib.decompress(base64.b64decode(data["inputs"]))
+        return cls(data["seed"], data.get("stress", 0), inputs, data.get("final_state"),
+                   data.get("sim_radius"))
+
+def game_fingerprint(game):
+    # State compared after a playback to prove it matched the recording
+    player = game.player
+    return {
+        "frame": game.frame,
+        "level": game.level,
+        "score": player.score,
+        "lives": player.lives,
+        "health": player.health,
+        "player_x": player.rect.x,
+        "camera_x": round(game.camera.offset_x, 6),
+        "sprites": sum(game.sprite_counts().values()),
+    }
+
+# --- Game State ---
+class Game:
+    # Game state and logic; step() advances one fixed timestep and never draws
+    def __init__(self, sim_radius=None):
+        # --- Game Groups ---
+        self.player = Player()
+        self.player_group = pygame.sprite.GroupSingle(self.player)
+        self.enemy_group = pygame.sprite.Group()
+        self.advanced_enemy_group = pygame.sprite.Group()
+        self.bullet_group = pygame.sprite.Group()
+        self.collectibles = pygame.sprite.Group()
+        self.boss_group = pygame.sprite.Group()
+
+        # --- Camera ---
+        self.camera = Camera()
+
+        # --- Collision broadphase ---
+        self.enemy_hash = SpatialHash()
+        self.adv_enemy_hash = SpatialHash()
+
+        # --- Game Variables ---
+        self.spawn_timer = 0
+        self.collect_timer = 0
+        self.boss_spawned = False
+        self.level = 0
+        self.level_cleared = False
+        self.game_over = False
+        self.message = ""  # Centre-screen message, drawn while message_timer > 0
+        self.message_timer = 0
+        self.game_timer = 0  # Track game time for guide message
+        self.player_idle_timer = 0  # Track player idle time
+        self.frame = 0  # Steps simulated since start
+        self.profiler = None  # Optional FrameProfiler
+
+        # --- Simulation radius ---
+        # Pixels beyond the screen edges within which monsters, bullets and
+        # collectibles are updated; None updates everything (see update_nearby)
+        self.sim_radius = sim_radius
+        self.frozen = 0  # Sprites skipped by the last step
+
+    @property
+    def boss(self):
+        return self.boss_group.sprites()[0] if self.boss_group else None
+
+    @property
+    def won(self):
+        return self.level == 2 and self.level_cleared
+
+    def sprite_counts(self):
+        boss = self.boss
+        return {
+            "enemies": len(self.enemy_group),
+            "advanced_enemies": len(self.advanced_enemy_group),
+            "bullets": len(self.bullet_group),
+            "collectibles": len(self.collectibles),
+            "boss": len(self.boss_group),
+            "boss_bullets": len(boss.bullets) if boss else 0,
+            "frozen": self.frozen,
+        }
+
+    # --- Functions for showing messages ---
+    def show_message(self, text, duration=180):
+        self.message = text
+        self.message_timer = duration
+
+    def clear_level(self):
+        for boss in self.boss_group:
+            boss.bullets.empty()  # Hands the bullets back to their pool
+        self.enemy_group.empty()
+        self.advanced_enemy_group.empty()
+        self.bullet_group.empty()
+        self.collectibles.empty()
+        self.boss_group.empty()
+        self.spawn_timer = 0
+        self.collect_timer = 0
+
+    def restart(self):
+        player = self.player
+        player.health = player.max_health
+        player.lives = player.max_lives
+        player.score = 0
+        self.level = 0
+        self.level_cleared = False
+        self.game_over = False
+        self.boss_spawned = False
+        self.clear_level()
+        player.rect.midbottom = (100, GROUND_HEIGHT)
+        self.camera.offset_x = 0  # Reset camera
+        self.game_timer = 0
+        self.player_idle_timer = 0
+        self.show_message("")
+
+    def damage_player(self, amount):
+        player = self.player
+        player.health -= amount
+        SOUNDS.play("hit")
+        if player.health <= 0:
+            player.lives -= 1
+            player.health = player.max_health
+            if player.lives <= 0:
+                self.game_over = True
+                self.show_message("Game Over! Press R to restart", 9999)
+
+    def stress_spawn(self, count):
+        # Top up monsters across the visible world and auto-fire every frame
+        while len(self.enemy_group) < count:
+            enemy = ENEMY_POOL.acquire(self.camera.offset_x)
+            enemy.rect.x = random.randint(int(self.camera.offset_x), WORLD_WIDTH)
+            self.enemy_group.add(enemy)
+        player = self.player
+        self.bullet_group.add(BULLET_POOL.acquire((player.rect.right, player.rect.centery + random.randint(-40, 40))))
+        player.lives = player.max_lives  # The player cannot die during a stress run
+
+    def step(self, inputs):
+        player = self.player
+        camera = self.camera
+        profiler = self.profiler
+        self.frame += 1
+        SOUNDS.tick()
+
+        # Input actions
+        if inputs.shoot and not self.level_cleared and not self.game_over:
+            bullet = BULLET_POOL.acquire(player.rect.midright)
+            self.bullet_group.add(bullet)
+            SOUNDS.play("shoot")
+
+        if inputs.restart and (self.level_cleared or self.game_over):
+            self.restart()
+
+        # Track game time and player idle
+        if not self.game_over and not self.level_cleared:
+            self.game_timer += 1
+            if not inputs.right and player.rect.right < 150:
+                self.player_idle_timer += 1
+            else:
+                self.player_idle_timer = 0
+
+        # Only update game if not game over and not level cleared
+        if not self.game_over and not self.level_cleared:
+            self.spawn_enemies()
+        if profiler:
+            profiler.mark("spawn")
+
+        # --- Update Sprites ---
+        self.player_group.update(inputs)
+        self.frozen = 0
+        self.update_nearby(self.enemy_group)
+        self.update_nearby(self.advanced_enemy_group)
+        self.update_nearby(self.bullet_group)
+        self.update_nearby(self.collectibles)
+        self.boss_group.update(camera)
+
+        boss = self.boss
+        if boss:
+            boss.shoot_timer += 1
+            if boss.shoot_timer >= 90:  # 1.5 seconds
+                boss.shoot()
+                boss.shoot_timer = 0
+            boss.bullets.update(camera)
+        if profiler:
+            profiler.mark("update")
+
+        # Update camera
+        camera.update(player.rect)
+        if profiler:
+            profiler.mark("camera")
+
+        self.check_collisions()
+        self.update_level()
+        if profiler:
+            profiler.mark("collision")
+
+    def update_nearby(self, group):
+        # Sprites within sim_radius of the screen or in the spawn band update;
+        # further ahead they freeze, and ones out of reach are despawned
+        camera = self.camera
+        if self.sim_radius is None:
+            group.update(camera)
+            return
+        left = camera.offset_x - self.sim_radius
+        right = camera.offset_x + SCREEN_WIDTH + max(self.sim_radius, SPAWN_MARGIN)
+        unreachable = WORLD_WIDTH + max(self.sim_radius, SPAWN_MARGIN)
+        for sprite in group.sprites():
+            rect = sprite.rect
+            if rect.right < left or rect.left > unreachable:
+                sprite.kill()
+            elif rect.left > right:
+                self.frozen += 1
+            else:
+                sprite.update(camera)
+
+    def spawn_enemies(self):
+        camera = self.camera
+        player = self.player
+        self.spawn_timer += 1
+        if self.level < 2:  # Stop collectibles in level 3 after victory
+            self.collect_timer += 1
+
+        if self.level == 0:
+            if self.spawn_timer > 30:  # 0.5 seconds
+                self.enemy_group.add(ENEMY_POOL.acquire(camera.offset_x))
+                self.spawn_timer = 0
+        elif self.level == 1:
+            if self.spawn_timer > 50:
+                self.advanced_enemy_group.add(ADV_ENEMY_POOL.acquire(camera.offset_x))
+                self.spawn_timer = 0
+        elif self.level == 2:
+            if self.spawn_timer > 50:
+                self.advanced_enemy_group.add(ADV_ENEMY_POOL.acquire(camera.offset_x))
+                self.spawn_timer = 0
+
+        if self.collect_timer > 300 and (not self.level_cleared or self.level < 2):
+            self.collect_timer = 0
             spawned_collectibles = 0
             if player.lives < player.max_lives:
-                collectibles.add(Collectible(camera.offset_x, 'life'))
+                self.collectibles.add(COLLECTIBLE_POOL.acquire(camera.offset_x, 'life'))
                 spawned_collectibles += 1
             if player.health < player.max_health and spawned_collectibles < 2:
                 count = random.randint(1, 2 - spawned_collectibles)
                 for _ in range(count):
-                    collectibles.add(Collectible(camera.offset_x, 'health'))
+                    self.collectibles.add(COLLECTIBLE_POOL.acquire(camera.offset_x, 'health'))
                     spawned_collectibles += 1
             while spawned_collectibles < 2:
-                collectibles.add(Collectible(camera.offset_x, 'score'))
+                self.collectibles.add(COLLECTIBLE_POOL.acquire(camera.offset_x, 'score'))
                 spawned_collectibles += 1
 
-    # --- Update Sprites ---
-    player_group.update(keys)
-    enemy_group.update()
-    advanced_enemy_group.update()
-    bullet_group.update()
-    collectibles.update()
-    boss_group.update()
-
-    if boss_group:
-        boss = boss_group.sprites()[0]
-        boss.shoot_timer += 1
-        if boss.shoot_timer >= 90:  # 1.5 seconds
-            boss.shoot()
-            boss.shoot_timer = 0
-        boss.bullets.update()
-
-    # Update camera
-    camera.update(player.rect)
-
-    # --- Collision Detection ---
-    for bullet in bullet_group:
-        hit_enemies = pygame.sprite.spritecollide(bullet, enemy_group, True)
-        hit_adv_enemies = pygame.sprite.spritecollide(bullet, advanced_enemy_group, False)
-        hit_boss = pygame.sprite.spritecollide(bullet, boss_group, False)
-        if hit_enemies:
-            bullet.kill()
-            ENEMY_HIT_SOUND.play()
-            player.score += 5
-        if hit_adv_enemies:
-            bullet.kill()
-            ENEMY_HIT_SOUND.play()
-            for enemy in hit_adv_enemies:
-                enemy.health -= 1
-                if enemy.health <= 0:
-                    enemy.kill()
-                    player.score += 5
-        if hit_boss:
-            bullet.kill()
-            ENEMY_HIT_SOUND.play()
-            boss = hit_boss[0]
-            boss.health -= 20
-            player.score += 10
-            if boss.health <= 0:
-                boss.kill()
-                player.score += 100
-
-    if player.on_ground:
-        if pygame.sprite.spritecollide(player, enemy_group, True) or \
-           pygame.sprite.spritecollide(player, advanced_enemy_group, True):
-            player.health -= 2
-            HIT_SOUND.play()  
-            if player.health <= 0:
-                player.lives -= 1
-                player.health = player.max_health
-                if player.lives <= 0:
-                    game_over = True
-                    show_message("Game Over! Press R to restart", 9999) 
-
-    if not game_over and boss_group:
-        for bullet in boss.bullets:
-            if pygame.sprite.collide_rect(player, bullet):
-                player.health -= 1
-                HIT_SOUND.play()
+    def check_collisions(self):
+        player = self.player
+        # Monsters are queried by every bullet and the player; groups with a
+        # single query rect (the player) are scanned directly
+        hashed = bool(self.bullet_group)
+        if hashed:
+            queries = len(self.bullet_group) + 1
+            self.enemy_hash.rebuild(self.enemy_group, queries)
+            self.adv_enemy_hash.rebuild(self.advanced_enemy_group, queries)
+
+        for bullet in self.bullet_group:
+            hit_enemies = self.enemy_hash.query(bullet.rect)
+            for enemy in hit_enemies:
+                enemy.kill()
+            hit_adv_enemies = self.adv_enemy_hash.query(bullet.rect)
+            hit_boss = pygame.sprite.spritecollide(bullet, self.boss_group, False)
+            if hit_enemies:
+                bullet.kill()
+                SOUNDS.play("enemy_hit")
+                player.score += 5
+            if hit_adv_enemies:
                 bullet.kill()
-                if player.health <= 0:
-                    player.lives -= 1
-                    player.health = player.max_health
-                    if player.lives <= 0:
-                        game_over = True
-                        show_message("Game Over! Press R to restart", 9999)
-
-    hits = pygame.sprite.spritecollide(player, collectibles, True)
-    for c in hits:
-        COLLECT_SOUND.play()
-        if c.kind == 'health' and player.health < player.max_health:
-            player.health = min(player.max_health, player.health + 1)
-        elif c.kind == 'life' and player.lives < player.max_lives:
-            player.lives = min(player.max_lives, player.lives + 1)
-        elif c.kind == 'score':
-            player.score += 10
-
-    # --- Level progression ---
-    if not level_cleared and not game_over:
-        if level == 0 and player.score >= LEVEL1_SCORE:
-            level_cleared = True
-            show_message("You win! Proceed to next level", 180)
-        elif level == 1 and player.score >= LEVEL2_SCORE:
-            level_cleared = True
-            show_message("You win! Proceed to next level", 180)
-        elif level == 2:
-            if not boss_spawned:
-                boss = Boss(camera.offset_x)
-                boss_group.add(boss)
-                boss_spawned = True
-            if len(boss_group) == 0:
-                level_cleared = True
-                collectibles.empty()  # Clear collectibles on victory
-                collect_timer = 0  # Reset to prevent new collectibles
-                show_message("Congratulations! You won! Press R to restart", 9999)
+                SOUNDS.play("enemy_hit")
+                for enemy in hit_adv_enemies:
+                    enemy.health -= 1
+                    if enemy.health <= 0:
+                        enemy.kill()
+                        player.score += 5
+            if hit_boss:
+                bullet.kill()
+                SOUNDS.play("enemy_hit")
+                boss = hit_boss[0]
+                boss.health -= 20
+                player.score += 10
+                if boss.health <= 0:
+                    boss.bullets.empty()
+                    boss.kill()
+                    player.score += 100
+
+        if player.on_ground:
+            if hashed:
+                hit_by = self.enemy_hash.query(player.rect) or self.adv_enemy_hash.query(player.rect)
+                for enemy in hit_by:
+                    enemy.kill()
+            else:
+                hit_by = pygame.sprite.spritecollide(player, self.enemy_group, True) or \
+                         pygame.sprite.spritecollide(player, self.advanced_enemy_group, True)
+            if hit_by:
+                self.damage_player(2)
+
+        boss = self.boss
+        if not self.game_over and boss:
+            for bullet in pygame.sprite.spritecollide(player, boss.bullets, True):
+                self.damage_player(1)
+
+        hits = pygame.sprite.spritecollide(player, self.collectibles, True)
+        for c in hits:
+            SOUNDS.play("collect")
+            if c.kind == 'health' and player.health < player.max_health:
+                player.health = min(player.max_health, player.health + 1)
+            elif c.kind == 'life' and player.lives < player.max_lives:
+                player.lives = min(player.max_lives, player.lives + 1)
+            elif c.kind == 'score':
+                player.score += 10
+
+    def update_level(self):
+        # --- Level progression ---
+        player = self.player
+        if not self.level_cleared and not self.game_over:
+            if self.level == 0 and player.score >= LEVEL1_SCORE:
+                self.level_cleared = True
+                self.show_message("You win! Proceed to next level", 180)
+            elif self.level == 1 and player.score >= LEVEL2_SCORE:
+                self.level_cleared = True
+                self.show_message("You win! Proceed to next level", 180)
+            elif self.level == 2:
+                if not self.boss_spawned:
+                    self.boss_group.add(Boss(self.camera.offset_x))
+                    self.boss_spawned = True
+                if len(self.boss_group) == 0:
+                    self.level_cleared = True
+                    self.collectibles.empty()  # Clear collectibles on victory
+                    self.collect_timer = 0  # Reset to prevent new collectibles
+                    self.show_message("Congratulations! You won! Press R to restart", 9999)
 
-    else:
-        if level < 2:  # Only decrease timer for levels 1 and 2
-            win_message_timer -= 1
-            if win_message_timer <= 0:
-                level += 1
-                level_cleared = False
-                boss_spawned = False
-                enemy_group.empty()
-                advanced_enemy_group.empty()
-                bullet_group.empty()
-                collectibles.empty()
-                boss_group.empty()
-                boss_bullets.empty()
-                spawn_timer = 0
-                collect_timer = 0
-                show_message("")
-
-    # --- Drawing ---
-    camera.draw_background(screen, BG_LEVELS[min(level, 2)])
-    
-    if not game_over:
-        for sprite in player_group:
-            screen.blit(sprite.image, camera.apply(sprite.rect))
-        for sprite in enemy_group:
-            screen.blit(sprite.image, camera.apply(sprite.rect))
-        for sprite in advanced_enemy_group:
-            screen.blit(sprite.image, camera.apply(sprite.rect))
-            sprite.draw_health_bar(screen, camera)
-        for sprite in bullet_group:
-            screen.blit(sprite.image, camera.apply(sprite.rect))
-        for sprite in collectibles:
-            screen.blit(sprite.image, camera.apply(sprite.rect))
-        for sprite in boss_group:
-            screen.blit(sprite.image, camera.apply(sprite.rect))
-            sprite.draw_health_bar(screen)  # Fixed position
-        if boss_group:
-            for bullet in boss.bullets:
-                screen.blit(bullet.image, camera.apply(bullet.rect))
-
-    player.draw_health_bar(screen, camera)
-
-    lives_text = font.render(f"Lives: {player.lives}", True, (255, 255, 255))
-    score_text = font.render(f"Score: {player.score}", True, (255, 255, 255))
-    level_text = font.render(f"Level: {level + 1}", True, (255, 255, 255))
-    
-    screen.blit(lives_text, (10, 10))
-    screen.blit(score_text, (10, 40))
-    screen.blit(level_text, (10, 70))
-    
-    controls_text = small_font.render("Controls: Left/Right move, Up jump, F shoot, R restart", True, (200, 200, 200))
-    screen.blit(controls_text, (SCREEN_WIDTH - controls_text.get_width() - 10, SCREEN_HEIGHT - 30))
-
-    # Show guide message
-    if game_timer < 300 or player_idle_timer > 60:  # First 5 seconds or idle 1 second
-        guide_text = small_font.render("Press RIGHT to proceed!", True, (255, 255, 255))
-        guide_rect = guide_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT - 60))
-        screen.blit(guide_text, guide_rect)
-
-    if win_message_timer > 0:
-        text_rect = win_message.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2))
-        screen.blit(win_message, text_rect)
-
-    pygame.display.flip()
-
-pygame.quit()
\ No newline at end of file
+        else:
+            if self.level < 2:  # Only decrease timer for levels 1 and 2
+                self.message_timer -= 1
+                if self.message_timer <= 0:
+                    self.level += 1
+                    self.level_cleared = False
+                    self.boss_spawned = False
+                    self.clear_level()
+                    self.show_message("")
+
+# --- HUD text cache ---
+class TextCache:
+    # Rendered text by (font, text, color), least recently used dropped first
+    def __init__(self, max_size=32):
+        self.max_size = max_size
+        self.surfaces = OrderedDict()
+
+    def render(self, font, text, color):
+        key = (font, text, color)
+        surface = self.surfaces.get(key)
+        if surface is None:
+            surface = font.render(text, True, color)
+            self.surfaces[key] = surface
+            if len(self.surfaces) > self.max_size:
+                self.surfaces.popitem(last=False)
+        else:
+            self.surfaces.move_to_end(key)
+        return surface
+
+# --- Rendering ---
+class Renderer:
+    # Draws a Game; all drawing state lives here
+    def __init__(self, screen, dirty=False, profiler=None):
+        self.screen = screen
+        self.dirty = dirty
+        self.profiler = profiler
+        self.profile_panel = None  # Overlay surface, re-rendered a few times per second
+
+        # Font for UI and messages
+        self.font = pygame.font.SysFont(None, 36)
+        self.small_font = pygame.font.SysFont(None, 28)
+        self.big_font = pygame.font.SysFont(None, 50)
+        self.text_cache = TextCache()
+
+        # Static HUD text is rendered once
+        self.controls_text = self.small_font.render("Controls: Left/Right move, Up jump, F shoot, R restart", True, (200, 200, 200))
+        self.controls_pos = (SCREEN_WIDTH - self.controls_text.get_width() - 10, SCREEN_HEIGHT - 30)
+        self.guide_text = self.small_font.render("Press RIGHT to proceed!", True, (255, 255, 255))
+        self.guide_rect = self.guide_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT - 60))
+
+        # --- Dirty-rect rendering state ---
+        self.last_drawn = []          # Screen rects drawn last frame (erased before redrawing)
+        self.last_camera_x = None     # Integer camera offset of the last frame
+        self.last_bg = None           # Background strip of the last frame
+        self.culled = 0               # Sprites outside the view skipped last frame
+
+    def draw(self, game):
+        screen = self.screen
+        camera = game.camera
+        player = game.player
+        text_cache = self.text_cache
+        profiler = self.profiler
+
+        bg = BG_LEVELS[min(game.level, 2)]
+        # Dirty-rect mode repaints only what changed while the camera stands still;
+        # a scrolling camera or a new background needs a full redraw
+        full_redraw = not self.dirty or int(camera.offset_x) != self.last_camera_x or bg is not self.last_bg
+        if full_redraw:
+            camera.draw_background(screen, bg)
+        else:
+            for rect in self.last_drawn:
+                camera.restore_background(screen, bg, rect)
+        if profiler:
+            profiler.mark("background")
+        drawn = []  # Every blit and health bar returns the screen rect it touched
+        self.culled = 0
+
+        if not game.game_over:
+            # Sprites outside the view are skipped, health bars included
+            view = camera.view_rect()
+            self.draw_visible(game.player_group, camera, view, drawn)
+            self.draw_visible(game.enemy_group, camera, view, drawn)
+            self.draw_visible(game.advanced_enemy_group, camera, view, drawn, health_bars=True)
+            self.draw_visible(game.bullet_group, camera, view, drawn)
+            self.draw_visible(game.collectibles, camera, view, drawn)
+            for sprite in game.boss_group:
+                self.draw_visible((sprite,), camera, view, drawn)
+                drawn.append(sprite.draw_health_bar(screen))  # Fixed position
+                self.draw_visible(sprite.bullets, camera, view, drawn)
+
+        drawn.append(player.draw_health_bar(screen, camera))
+        if profiler:
+            profiler.mark("sprites")
+
+        # HUD lines come from the text cache and are only re-rendered when they change
+        drawn.append(screen.blit(text_cache.render(self.font, f"Lives: {player.lives}", (255, 255, 255)), (10, 10)))
+        drawn.append(screen.blit(text_cache.render(self.font, f"Score: {player.score}", (255, 255, 255)), (10, 40)))
+        drawn.append(screen.blit(text_cache.render(self.font, f"Level: {game.level + 1}", (255, 255, 255)), (10, 70)))
+        
+        drawn.append(screen.blit(self.controls_text, self.controls_pos))
+
+        # Show guide message
+        if game.game_timer < 300 or game.player_idle_timer > 60:  # First 5 seconds or idle 1 second
+            drawn.append(screen.blit(self.guide_text, self.guide_rect))
+
+        if game.message_timer > 0 and game.message:
+            win_message = text_cache.render(self.big_font, game.message, (255, 255, 255))
+            text_rect = win_message.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2))
+            drawn.append(screen.blit(win_message, text_rect))
+        if profiler:
+            profiler.mark("hud")
+            if profiler.visible:
+                drawn.append(self.draw_profile_overlay())
+            profiler.mark("overlay")
+
+        if full_redraw:
+            pygame.display.flip()
+        else:
+            # Old positions (now erased) and new positions are both sent to the display
+            pygame.display.update(self.last_drawn + drawn)
+        self.last_drawn = drawn
+        self.last_camera_x = int(camera.offset_x)
+        self.last_bg = bg
+        if profiler:
+            profiler.mark("flip")
+
+    def draw_visible(self, sprites, camera, view, drawn, health_bars=False):
+        screen = self.screen
+        for sprite in sprites:
+            if not view.colliderect(sprite.rect):
+                self.culled += 1
+                continue
+            drawn.append(screen.blit(sprite.image, camera.apply(sprite.rect)))
+            if health_bars:
+                drawn.append(sprite.draw_health_bar(screen, camera))
+
+    def draw_profile_overlay(self):
+        # Text changes every frame, so the panel is rebuilt only every 15 frames
+        if self.profile_panel is None or self.profiler.frames % 15 == 0:
+            lines = self.profiler.summary_lines() or ["collecting..."]
+            surfaces = [self.small_font.render(line, True, (255, 255, 0)) for line in lines]
+            width = max(surface.get_width() for surface in surfaces) + 10
+            self.profile_panel = pygame.Surface((width, 22 * len(surfaces) + 6), pygame.SRCALPHA)
+            self.profile_panel.fill((0, 0, 0, 170))
+            for i, surface in enumerate(surfaces):
+                self.profile_panel.blit(surface, (5, 4 + 22 * i))
+        return self.screen.blit(self.profile_panel, (10, 100))
+
+# --- Headless simulation ---
+def scripted_inputs(game):
+    # Simple bot for simulations: walk right, shoot every 10 steps, jump when a
+    # monster is close ahead and restart when the run has ended
+    player = game.player
+    near = any(0 < e.rect.left - player.rect.right < 120
+               for group in (game.enemy_group, game.advanced_enemy_group) for e in group)
+    return Inputs(
+        right=player.rect.centerx < game.camera.offset_x + SCREEN_WIDTH // 2 + 200,
+        up=near,
+        shoot=game.frame % 10 == 0,
+        restart=game.game_over or game.won
+    )
+
+def simulate(steps, seed=None, policy=scripted_inputs, game=None):
+    # Headless fixed timesteps without frame cap; needs init_display(headless=True)
+    # and load_assets(music=False) first
+    if seed is not None:
+        random.seed(seed)
+    game = game or Game()
+    runs = wins = 0
+    start = time.perf_counter()
+    for _ in range(steps):
+        inputs = policy(game)
+        if inputs.restart and (game.game_over or game.won):
+            runs += 1
+            wins += game.won
+        game.step(inputs)
+    elapsed = time.perf_counter() - start
+    return {
+        "steps": steps,
+        "seconds": elapsed,
+        "steps_per_sec": steps / elapsed if elapsed else 0.0,
+        "speedup": steps / FPS / elapsed if elapsed else 0.0,
+        "finished_runs": runs,
+        "wins": wins,
+        "level": game.level + 1,
+        "score": game.player.score,
+        "lives": game.player.lives,
+    }
+
+def play_replay(replay, game=None):
+    # Headless playback (setup as simulate); returns (game, seconds, matches recording)
+    random.seed(replay.seed)
+    game = game or Game(sim_radius=replay.sim_radius)
+    start = time.perf_counter()
+    for inputs in replay:
+        if replay.stress:
+            game.stress_spawn(replay.stress)
+        game.step(inputs)
+    elapsed = time.perf_counter() - start
+    return game, elapsed, game_fingerprint(game) == replay.final_state
+
+# --- Gym-style environment ---
+# What an agent sees after each step; distances are from the player's centre
+# to the nearest monster, boss bullet and collectible (WORLD_WIDTH, 0 if none)
+Observation = namedtuple("Observation", "player_x player_y health lives score level camera_x boss_health "
+                         "monsters monster_dx monster_dy boss_bullet_dx boss_bullet_dy "
+                         "collectible_dx collectible_dy")
+ACTION_COUNT = 2 ** len(Inputs._fields)  # Integer actions are packed Inputs (see pack_inputs)
+
+class GameEnv:
+    # Gym-style reset()/step() around one Game: reward is the score gained, episodes
+    # end on game over, victory or max_steps, and the restart bit is ignored
+    def __init__(self, sim_radius=None, max_steps=None):
+        self.sim_radius = sim_radius
+        self.max_steps = max_steps
+        self.game = None
+
+    def reset(self, seed=None):
+        if seed is not None:
+            random.seed(seed)
+        if self.game is not None:
+            self.game.clear_level()  # Hands the old sprites back to their pools
+        self.game = Game(sim_radius=self.sim_radius)
+        return self.observation()
+
+    def step(self, action):
+        game = self.game
+        inputs = action if isinstance(action, Inputs) else unpack_inputs(action)
+        inputs = inputs._replace(restart=False)  # Resetting is reset()'s job, not the agent's
+        score = game.player.score
+        game.step(inputs)
+        truncated = self.max_steps is not None and game.frame >= self.max_steps
+        done = game.game_over or game.won or truncated
+        info = {"frame": game.frame, "level": game.level, "won": game.won, "truncated": truncated}
+        return self.observation(), game.player.score - score, done, info
+
+    def observation(self):
+        game = self.game
+        player = game.player
+        x, y = player.rect.center
+
+        def nearest(*groups):
+            rects = [sprite.rect for group in groups for sprite in group]
+            if not rects:
+                return WORLD_WIDTH, 0
+            rect = min(rects, key=lambda r: abs(r.centerx - x))
+            return rect.centerx - x, rect.centery - y
+
+        boss = game.boss
+        boss_bullets = boss.bullets if boss else ()
+        return Observation(
+            x, y, player.health, player.lives, player.score, game.level, round(game.camera.offset_x, 2),
+            boss.health if boss else 0,
+            len(game.enemy_group) + len(game.advanced_enemy_group),
+            *nearest(game.enemy_group, game.advanced_enemy_group),
+            *nearest(boss_bullets),
+            *nearest(game.collectibles)
+        )
+
+ENV_POLICIES = ("scripted", "random")
+
+def run_env_worker(env_count, steps, seed, policy, sim_radius=None):
+    # Steps env_count GameEnvs in this process, resetting finished episodes
+    init_display(headless=True)
+    load_assets(music=False)
+    random.seed(seed)
+    actions = random.Random(seed)  # Random policy; separate from the game's random
+    envs = [GameEnv(sim_radius) for _ in range(env_count)]
+    for env in envs:
+        env.reset()
+    episodes = wins = reward = 0
+    start = time.perf_counter()
+    for _ in range(steps):
+        for env in envs:
+            action = scripted_inputs(env.game) if policy == "scripted" else actions.randrange(ACTION_COUNT)
+            _, gained, done, info = env.step(action)
+            reward += gained
+            if done:
+                episodes += 1
+                wins += info["won"]
+                env.reset()
+    elapsed = time.perf_counter() - start
+    pygame.quit()
+    return {"frames": env_count * steps, "episodes": episodes, "wins": wins, "reward": reward, "seconds": elapsed}
+
+def run_envs(env_count, steps, workers=None, seed=0, policy="scripted", sim_radius=None):
+    # Spreads env_count environments over worker processes (seeded seed + i)
+    # and returns totals
+    workers = max(1, min(workers or os.cpu_count() or 1, env_count))
+    counts = [env_count // workers + (i < env_count % workers) for i in range(workers)]
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(run_env_worker, count, steps, seed + i, policy, sim_radius)
+                   for i, count in enumerate(counts)]
+        results = [future.result() for future in futures]
+    elapsed = time.perf_counter() - start
+    frames = sum(result["frames"] for result in results)
+    return {
+        "envs": env_count,
+        "workers": workers,
+        "frames": frames,
+        "episodes": sum(result["episodes"] for result in results),
+        "wins": sum(result["wins"] for result in results),
+        "reward": sum(result["reward"] for result in results),
+        "seconds": elapsed,
+        "frames_per_sec": frames / elapsed if elapsed else 0.0,
+        # Stepping only, without process start-up and asset loading
+        "worker_frames_per_sec": sum(result["frames"] / result["seconds"] for result in results if result["seconds"]),
+    }
+
+# --- Entity benchmark ---
+BENCH_PROJECTILES = 128  # Bullets and boss bullets each; the monster count is what scales
+BENCH_STEPS = 60         # Steps per timing run
+BENCH_RUNS = 3           # Runs per monster count; the fastest counts, since noise only adds time
+
+def bench_sprites(monsters, steps):
+    # Median ms per step for sprite update and collision, as Game.step does it
+    game = Game()
+    player, camera = game.player, game.camera
+    boss_bullets = pygame.sprite.Group()
+    times = []
+    for _ in range(steps):
+        # Untimed: keep the population constant
+        player.lives = player.max_lives
+        while len(game.enemy_group) < monsters * 2 // 3:
+            enemy = ENEMY_POOL.acquire(0)
+            enemy.rect.x = random.randint(0, WORLD_WIDTH)
+            game.enemy_group.add(enemy)
+        while len(game.advanced_enemy_group) < monsters - monsters * 2 // 3:
+            enemy = ADV_ENEMY_POOL.acquire(0)
+            enemy.rect.x = random.randint(0, WORLD_WIDTH)
+            game.advanced_enemy_group.add(enemy)
+        while len(game.bullet_group) < BENCH_PROJECTILES:
+            pos = (random.randint(0, SCREEN_WIDTH), random.randint(GROUND_HEIGHT - 150, GROUND_HEIGHT))
+            game.bullet_group.add(BULLET_POOL.acquire(pos))
+        while len(boss_bullets) < BENCH_PROJECTILES:
+            pos = (random.randint(0, WORLD_WIDTH), random.randint(GROUND_HEIGHT - 150, GROUND_HEIGHT))
+            boss_bullets.add(BOSS_BULLET_POOL.acquire(pos))
+
+        start = time.perf_counter()
+        game.enemy_group.update(camera)
+        game.advanced_enemy_group.update(camera)
+        game.bullet_group.update(camera)
+        boss_bullets.update(camera)
+        game.check_collisions()
+        for bullet in pygame.sprite.spritecollide(player, boss_bullets, True):
+            game.damage_player(1)
+        times.append(time.perf_counter() - start)
+    game.clear_level()
+    boss_bullets.empty()
+    return sorted(times)[len(times) // 2] * 1000
+
+def bench_arrays(monsters, steps):
+    # Median ms per step for EntityWorld.step with the same population
+    world = EntityWorld(seed=1)
+    rng = world.enemies.rng
+    player_rect = pygame.Rect(0, 0, 100, 100)
+    player_rect.midbottom = (100, GROUND_HEIGHT)
+    targets = [(world.enemies, monsters * 2 // 3, WORLD_WIDTH),
+               (world.advanced_enemies, monsters - monsters * 2 // 3, WORLD_WIDTH),
+               (world.bullets, BENCH_PROJECTILES, SCREEN_WIDTH),
+               (world.boss_bullets, BENCH_PROJECTILES, WORLD_WIDTH)]
+    times = []
+    for _ in range(steps):
+        for arrays, target, width in targets:
+            missing = target - len(arrays)
+            if missing > 0:
+                if arrays.kind in ("enemy", "advanced_enemy"):
+                    y = GROUND_HEIGHT - arrays.h
+                else:
+                    y = rng.integers(GROUND_HEIGHT - 150, GROUND_HEIGHT, missing)
+                arrays.spawn(rng.integers(0, width, missing), y)
+
+        start = time.perf_counter()
+        world.step(0, player_rect)
+        times.append(time.perf_counter() - start)
+    return sorted(times)[len(times) // 2] * 1000
+
+def bench_entities(budget_ms=1000 / FPS, steps=BENCH_STEPS, runs=BENCH_RUNS, seed=1):
+    # Most monsters whose update and collision fit in budget_ms, found by doubling
+    # then bisecting; returns {model: (max monsters, [(monsters, ms), ...])}
+    random.seed(seed)
+    results = {}
+    for name, bench in (("sprites", bench_sprites), ("arrays", bench_arrays)):
+        timings = []
+        def within_budget(monsters):
+            ms = min(bench(monsters, steps) for _ in range(runs))
+            timings.append((monsters, ms))
+            return ms <= budget_ms
+        best, count = 0, 250
+        while within_budget(count):
+            best, count = count, count * 2
+        for _ in range(4):
+            middle = (best + count) // 2
+            if within_budget(middle):
+                best = middle
+            else:
+                count = middle
+        results[name] = (best, sorted(timings))
+    return results
+
+# --- Game Loop ---
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Monster Hunter")
+    parser.add_argument("--stress", type=int, default=0, metavar="N", help="Keep N monsters alive and report frame time")
+    parser.add_argument("--dirty", action="store_true", help="Dirty-rectangle rendering")
+    parser.add_argument("--profile", action="store_true", help="Show the performance overlay and log timings")
+    parser.add_argument("--profile-csv", default=None, metavar="FILE", help="Write per-frame timings to FILE on exit")
+    parser.add_argument("--simulate", type=int, default=0, metavar="STEPS", help="Run STEPS headless logic steps and exit")
+    parser.add_argument("--sim-radius", type=int, default=None, metavar="PIXELS",
+                        help="Freeze sprites further than PIXELS beyond the screen edges")
+    parser.add_argument("--bench-entities", action="store_true",
+                        help="Benchmark sprite classes against a NumPy array model: monsters per 60 FPS frame")
+    parser.add_argument("--envs", type=int, default=0, metavar="N",
+                        help="With --simulate: step N independent games (STEPS each) in worker processes")
+    parser.add_argument("--workers", type=int, default=None, help="With --envs: worker processes (default: CPU count)")
+    parser.add_argument("--policy", choices=ENV_POLICIES, default="scripted", help="With --envs: how actions are chosen")
+    parser.add_argument("--seed", type=int, default=None, help="Random seed")
+    parser.add_argument("--record", default=None, metavar="FILE", help="Record seed and inputs to FILE")
+    parser.add_argument("--replay", default=None, metavar="FILE", help="Play back a recording")
+    parser.add_argument("--headless", action="store_true", help="With --replay: no window, run as fast as possible")
+    args = parser.parse_args(argv)
+
+    playback = Replay.load(args.replay) if args.replay else None
+    if playback is not None:
+        args.stress = playback.stress
+        args.sim_radius = playback.sim_radius
+
+    if playback is not None and args.headless:
+        init_display(headless=True)
+        if args.stress:
+            ENEMY_POOL.size = max(ENEMY_POOL.size, args.stress)
+        load_assets(music=False)
+        game, elapsed, matches = play_replay(playback)
+        print(f"Replayed {len(playback)} steps in {elapsed:.2f}s ({len(playback) / elapsed:.0f} steps/s)")
+        print("Final state matches recording" if matches else
+              f"Final state differs: {game_fingerprint(game)} != {playback.final_state}")
+        pygame.quit()
+        return
+
+    if args.bench_entities:
+        if np is None:
+            parser.error("--bench-entities needs NumPy")
+        init_display(headless=True)
+        load_assets(music=False)
+        results = bench_entities()
+        for name, (best, timings) in results.items():
+            print(f"{name}: " + ", ".join(f"{monsters} {ms:.2f} ms" for monsters, ms in timings))
+        print(f"Max monsters at {FPS} FPS (update + collision, {BENCH_PROJECTILES} bullets and boss bullets): " +
+              ", ".join(f"{name} {best}" for name, (best, _) in results.items()))
+        pygame.quit()
+        return
+
+    if args.simulate and args.envs:
+        # Workers set up pygame themselves; this process only collects totals
+        result = run_envs(args.envs, args.simulate, args.workers, args.seed or 0, args.policy, args.sim_radius)
+        print(f"Stepped {result['envs']} games x {args.simulate} steps on {result['workers']} workers "
+              f"in {result['seconds']:.2f}s: {result['frames_per_sec']:.0f} frames/s "
+              f"({result['worker_frames_per_sec']:.0f} frames/s excluding start-up)")
+        print(f"Episodes: {result['episodes']}, wins: {result['wins']}, total reward: {result['reward']}")
+        return
+
+    if args.simulate:
+        init_display(headless=True)
+        load_assets(music=False)
+        result = simulate(args.simulate, args.seed, game=Game(sim_radius=args.sim_radius))
+        print(f"Simulated {result['steps']} steps in {result['seconds']:.2f}s "
+              f"({result['steps_per_sec']:.0f} steps/s, {result['speedup']:.0f}x real time)")
+        print(f"Finished runs: {result['finished_runs']}, wins: {result['wins']} | "
+              f"now level {result['level']}, score {result['score']}, lives {result['lives']}")
+        pygame.quit()
+        return
+
+    screen = init_display()
+    if args.stress:
+        ENEMY_POOL.size = max(ENEMY_POOL.size, args.stress)
+        BULLET_POOL.size = max(BULLET_POOL.size, 256)
+    assets = load_assets(stream=True)
+    recording = None
+    if playback is not None:
+        random.seed(playback.seed)
+        replay_inputs = iter(playback)
+    elif args.record:
+        # A recording always has a seed, chosen at random unless given
+        seed = args.seed if args.seed is not None else random.randrange(2**32)
+        random.seed(seed)
+        recording = Replay(seed, args.stress, sim_radius=args.sim_radius)
+    elif args.seed is not None:
+        random.seed(args.seed)
+    game = Game(sim_radius=args.sim_radius)
+    profiler = FrameProfiler(visible=args.profile, record=args.profile or bool(args.profile_csv))
+    game.profiler = profiler
+    renderer = Renderer(screen, dirty=args.dirty, profiler=profiler)
+    clock = pygame.time.Clock()
+
+    # Stress test timing
+    stress_frames = 0
+    stress_work_time = 0.0
+    stress_logic_time = 0.0
+    stress_created = sum(pool.created for pool in POOLS)
+
+    # Fixed timestep: logic always advances in STEP_SECONDS steps, rendering
+    # happens once per loop and catches up with several steps if it falls behind
+    accumulator = 0.0
+    pending = Inputs()  # Key presses not yet seen by a step
+    running = True
+    try:
+        while running:
+            accumulator += clock.tick(FPS) / 1000
+            frame_start = time.perf_counter()
+            profiler.start_frame()
+
+            # Events
+            events = pygame.event.get()
+            for event in events:
+                if event.type == pygame.QUIT:
+                    running = False
+                if event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                    profiler.visible = not profiler.visible
+                    profiler.record = True  # F4 exports frames from here on
+                    renderer.last_camera_x = None  # Full redraw removes the overlay
+                if event.type == pygame.KEYDOWN and event.key == pygame.K_F4:
+                    path = time.strftime("profile_%Y%m%d_%H%M%S.csv")
+                    print(f"Exported {profiler.export_csv(path)} frames to {path}")
+            inputs = read_inputs(events)
+            # A frame can run no step at all; its key presses wait for the next one
+            inputs = inputs._replace(shoot=inputs.shoot or pending.shoot,
+                                     restart=inputs.restart or pending.restart)
+            assets.poll()
+            profiler.mark("events")
+
+            steps = 0
+            while accumulator >= STEP_SECONDS and steps < MAX_CATCH_UP_STEPS:
+                if playback is not None:
+                    inputs = next(replay_inputs, None)
+                    if inputs is None:
+                        running = False  # Recording finished
+                        break
+                if args.stress:
+                    game.stress_spawn(args.stress)
+                game.step(inputs)
+                assets.wait_for_level(game.level)  # Only blocks if a level starts early
+                if recording is not None:
+                    recording.record(inputs)
+                inputs = inputs._replace(shoot=False, restart=False)  # Key presses count once
+                accumulator -= STEP_SECONDS
+                steps += 1
+            if steps == MAX_CATCH_UP_STEPS:
+                accumulator = 0.0  # Drop the backlog instead of spiralling
+            pending = inputs  # Presses are cleared once a step has used them
+            logic_end = time.perf_counter()
+
+            # --- Drawing ---
+            renderer.draw(game)
+            profiler.end_frame({**game.sprite_counts(), "culled": renderer.culled})
+            if args.profile and profiler.frames % FPS == 0:
+                print("profile: " + " || ".join(profiler.summary_lines()))
+                print(SOUNDS.summary())
+
+            if args.stress:
+                stress_frames += 1
+                stress_logic_time += logic_end - frame_start
+                stress_work_time += time.perf_counter() - frame_start
+                if stress_frames == FPS:
+                    created = sum(pool.created for pool in POOLS)
+                    print(f"stress: {len(game.enemy_group)} monsters, {len(game.bullet_group)} bullets | "
+                          f"update+collision {stress_logic_time / stress_frames * 1000:.2f} ms | "
+                          f"frame {stress_work_time / stress_frames * 1000:.2f} ms | "
+                          f"new sprites {created - stress_created}")
+                    stress_created = created
+                    stress_frames = 0
+                    stress_work_time = 0.0
+                    stress_logic_time = 0.0
+    finally:
+        # Also reached on Ctrl+C, so a profiling run or recording is never lost
+        if args.profile_csv:
+            print(f"Exported {profiler.export_csv(args.profile_csv)} frames to {args.profile_csv}")
+        if recording is not None:
+            recording.save(args.record, game)
+            print(f"Recorded {len(recording)} steps (seed {recording.seed}) to {args.record}")
+        if playback is not None:
+            matches = game_fingerprint(game) == playback.final_state
+            print("Final state matches recording" if matches else "Final state differs from recording")
+        if args.profile:
+            print(SOUNDS.summary())
+    pygame.quit()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,419 @@
+"""
+GUI-free image processing engine shared by the Image Editor and the batch CLI.
+
+The pipeline is the same one ImageEditor applies interactively:
+crop -> rotate -> scale -> brightness -> contrast.
+Images are NumPy arrays in RGB order, as used by the editor.
+
+Batch usage:
+    python image_engine.py recipe.json "photos/*.jpg" -o out --workers 4
+
+Example recipe (every key is optional):
+    {"crop": [0, 0, 800, 600], "rotate": 90, "scale": 0.5,
+     "brightness": 1.1, "contrast": 1.2, "format": ".jpg",
+     "encode": {"jpeg_quality": 90, "jpeg_progressive": true}}
+"""
+
+import argparse
+import glob
+import json
+import math
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from PIL import Image, ImageEnhance, ImageStat
+import cv2
+import numpy as np
+
+RECIPE_KEYS = {"crop", "rotate", "scale", "brightness", "contrast", "format", "encode"}
+
+# Encoder options accepted by save_image; each only applies to its own format
+ENCODE_OPTIONS = {"png_compression", "jpeg_quality", "jpeg_progressive", "webp_quality"}
+
+# Decode-time downscaling for quick previews of very large files. Only the
+# JPEG decoder can decode at reduced scale; other formats decode in full and
+# are shrunk afterwards, so a preview would only double the work
+PREVIEW_MAX_SIDE = 2048
+PREVIEW_FORMATS = {"JPEG"}
+REDUCED_FLAGS = {
+    1: cv2.IMREAD_COLOR,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+
+# Pixels sampled for the editor's histogram panel
+HISTOGRAM_PROXY_PIXELS = 250_000
+
+
+# --- Pipeline steps ---
+def crop_image(img, box):
+    # box is (x1, y1, x2, y2) in image pixels, clamped to the image bounds
+    h, w = img.shape[:2]
+    x1, y1, x2, y2 = box
+    x1, x2 = sorted([max(0, min(int(x1), w)), max(0, min(int(x2), w))])
+    y1, y2 = sorted([max(0, min(int(y1), h)), max(0, min(int(y2), h))])
+    if x2 <= x1 or y2 <= y1:
+        raise ValueError(f"Empty crop box: {box}")
+    return img[y1:y2, x1:x2]
+
+
+# Counter-clockwise quarter turns -> cv2.rotate code (None means unchanged)
+QUARTER_TURNS = {
+    0: None,
+    1: cv2.ROTATE_90_COUNTERCLOCKWISE,
+    2: cv2.ROTATE_180,
+    3: cv2.ROTATE_90_CLOCKWISE,
+}
+
+
+def rotate_image(img, angle):
+    # Positive angles rotate counter-clockwise, as in cv2.getRotationMatrix2D
+    if angle % 90 == 0:
+        # Exact quarter turns are a lossless transpose/flip that swaps w and h
+        code = QUARTER_TURNS[int(angle // 90) % 4]
+        return img if code is None else cv2.rotate(img, code)
+    return rotate_image_expand(img, angle)
+
+
+def rotate_image_expand(img, angle):
+    # Arbitrary angle: resample into a canvas large enough to hold every corner
+    h, w = img.shape[:2]
+    rot_mat = cv2.getRotationMatrix2D((w / 2, h / 2), angle, 1.0)
+    cos, sin = abs(rot_mat[0, 0]), abs(rot_mat[0, 1])
+    new_w = int(round(h * sin + w * cos))
+    new_h = int(round(h * cos + w * sin))
+    rot_mat[0, 2] += new_w / 2 - w / 2
+    rot_mat[1, 2] += new_h / 2 - h / 2
+    return cv2.warpAffine(img, rot_mat, (new_w, new_h), flags=cv2.INTER_CUBIC, borderMode=cv2.BORDER_CONSTANT)
+
+
+def scaled_size(img, scale):
+    h, w = img.shape[:2]
+    return max(1, int(w * scale)), max(1, int(h * scale))
+
+
+def scale_image(img, scale):
+    new_w, new_h = scaled_size(img, scale)
+    interp = cv2.INTER_AREA if scale < 1 else cv2.INTER_CUBIC
+    return cv2.resize(img, (new_w, new_h), interpolation=interp)
+
+
+def scale_region(img, out_size, x, y, w, h):
+    # Resample only the (x, y, w, h) region of img scaled to out_size. The inverse
+    # map matches cv2.resize pixel centres, so neighbouring regions line up seamlessly.
+    src_h, src_w = img.shape[:2]
+    out_w, out_h = out_size
+    sx, sy = out_w / src_w, out_h / src_h
+    mat = np.float32([
+        [1 / sx, 0, (x + 0.5) / sx - 0.5],
+        [0, 1 / sy, (y + 0.5) / sy - 0.5]
+    ])
+    return cv2.warpAffine(
+        img, mat, (w, h),
+        flags=cv2.INTER_CUBIC | cv2.WARP_INVERSE_MAP, borderMode=cv2.BORDER_REPLICATE
+    )
+
+
+def contrast_mean(img, brightness):
+    # Luma mean ImageEnhance.Contrast would use after the brightness step
+    bright = ImageEnhance.Brightness(Image.fromarray(img)).enhance(brightness)
+    return int(ImageStat.Stat(bright.convert("L")).mean[0] + 0.5)
+
+
+def adjust_pil_image(pil_img, brightness, contrast, mean=None):
+    pil_img = ImageEnhance.Brightness(pil_img).enhance(brightness)
+    if mean is None:
+        return ImageEnhance.Contrast(pil_img).enhance(contrast)
+    # Same blend as ImageEnhance.Contrast, but with a fixed mean so regions agree
+    degenerate = Image.new("L", pil_img.size, mean).convert(pil_img.mode)
+    return Image.blend(degenerate, pil_img, contrast)
+
+
+def adjust_image(img, brightness, contrast, mean=None):
+    return np.array(adjust_pil_image(Image.fromarray(img), brightness, contrast, mean))
+
+
+# --- Histograms ---
+def histogram_proxy(img, max_pixels=HISTOGRAM_PROXY_PIXELS):
+    # Strided view with about max_pixels pixels: no copy and no resampling
+    step = max(1, math.ceil(math.sqrt(img.shape[0] * img.shape[1] / max_pixels)))
+    return img[::step, ::step]
+
+
+def base_histogram(img, max_pixels=HISTOGRAM_PROXY_PIXELS):
+    """R, G, B and luma histograms (4 x 256 counts) of a downsampled proxy of img."""
+    proxy = histogram_proxy(img, max_pixels)
+    hist = np.empty((4, 256), np.int64)
+    for c in range(3):
+        hist[c] = np.bincount(proxy[..., c].ravel(), minlength=256)
+    r, g, b = (proxy[..., c].astype(np.uint32) for c in range(3))
+    luma = (r * 19595 + g * 38470 + b * 7471 + 0x8000) >> 16  # Same weights as PIL's "L"
+    hist[3] = np.bincount(luma.ravel(), minlength=256)
+    return hist
+
+
+def adjust_lut(brightness, contrast, mean):
+    # Brightness and contrast act on each channel value alone, so running a
+    # 0..255 ramp through adjust_image gives their exact transfer curve
+    ramp = np.repeat(np.arange(256, dtype=np.uint8), 3).reshape(1, 256, 3)
+    return adjust_image(ramp, brightness, contrast, mean)[0, :, 0]
+
+
+def adjusted_histogram(hist, brightness, contrast, mean=None):
+    """
+    Maps a base_histogram() through the brightness/contrast curve instead of
+    counting pixels again. R, G and B are exact. Luma is not a function of
+    input luma once single channels clip, so it is mapped through the
+    unrounded curve and split between neighbouring bins, which keeps it
+    smooth like the real one. mean is the contrast mean (see contrast_mean)
+    and is estimated from the channel histograms when None.
+    """
+    bright = adjust_lut(brightness, 1.0, 0)
+    if mean is None:
+        # Mean of PIL's "L" after the brightness step, from the channel means
+        channel_means = [np.dot(hist[c], bright) / max(1, hist[c].sum()) for c in range(3)]
+        mean = int(np.dot(channel_means, (0.299, 0.587, 0.114)) + 0.5)
+    lut = adjust_lut(brightness, contrast, mean)
+    rgb = [np.bincount(lut, weights=hist[c], minlength=256) for c in range(3)]
+
+    curve = np.clip(mean * (1 - contrast) + bright.astype(float) * contrast, 0, 255)
+    low = np.floor(curve).astype(np.intp)
+    upper = np.minimum(low + 1, 255)
+    frac = curve - low
+    luma = (np.bincount(low, weights=hist[3] * (1 - frac), minlength=256) +
+            np.bincount(upper, weights=hist[3] * frac, minlength=256))
+    return np.stack(rgb + [luma])
+
+
+def apply_recipe(img, recipe):
+    if recipe.get("crop") is not None:
+        img = crop_image(img, recipe["crop"])
+    if recipe.get("rotate", 0) % 360:
+        img = rotate_image(img, recipe["rotate"])
+    scale = recipe.get("scale", 1.0)
+    if scale != 1.0:
+        img = scale_image(img, scale)
+    brightness = recipe.get("brightness", 1.0)
+    contrast = recipe.get("contrast", 1.0)
+    if brightness != 1.0 or contrast != 1.0:
+        img = adjust_image(img, brightness, contrast)
+    return img
+
+
+# --- File helpers ---
+def load_image(path, reduce=1):
+    # reduce (1, 2, 4 or 8) lets the decoder downscale, which is much faster for JPEG
+    img = cv2.imread(path, REDUCED_FLAGS[reduce])
+    if img is None:
+        raise ValueError(f"Cannot read image: {path}")
+    # Convert in place so the full-size image is never held twice
+    return cv2.cvtColor(img, cv2.COLOR_BGR2RGB, dst=img)
+
+
+def preview_factor(path, max_side=PREVIEW_MAX_SIDE):
+    # Only the file header is read; formats without reduced decoding load directly
+    try:
+        with Image.open(path) as im:
+            w, h = im.size
+            if im.format not in PREVIEW_FORMATS:
+                return 1
+    except Exception:
+        return 1
+    factor = 1
+    while max(w, h) > max_side * factor and factor < 8:
+        factor *= 2
+    return factor
+
+
+class BackgroundTask:
+    """
+    Runs func(*args) on a worker thread, e.g. a full-resolution load or a save.
+    The result is only read back from the GUI thread through poll(), since Tk
+    widgets must not be touched from other threads.
+    """
+    def __init__(self, func, *args):
+        self.func = func
+        self.args = args
+        self.result = None
+        self.error = None
+        self.started = time.perf_counter()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        try:
+            self.result = self.func(*self.args)
+        except Exception as e:
+            self.error = e
+
+    def poll(self):
+        # True once the task has finished, successfully or not
+        return not self.thread.is_alive()
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+
+def encode_params(path, options):
+    # Translates encoder options into cv2.imwrite flags for the format of path
+    options = options or {}
+    unknown = set(options) - ENCODE_OPTIONS
+    if unknown:
+        raise ValueError(f"Unknown encode options: {', '.join(sorted(unknown))}")
+    ext = os.path.splitext(path)[1].lower()
+    params = []
+    if ext == ".png" and "png_compression" in options:
+        params += [cv2.IMWRITE_PNG_COMPRESSION, int(options["png_compression"])]
+    elif ext in (".jpg", ".jpeg"):
+        if "jpeg_quality" in options:
+            params += [cv2.IMWRITE_JPEG_QUALITY, int(options["jpeg_quality"])]
+        if options.get("jpeg_progressive"):
+            params += [cv2.IMWRITE_JPEG_PROGRESSIVE, 1]
+    elif ext == ".webp" and "webp_quality" in options:
+        params += [cv2.IMWRITE_WEBP_QUALITY, int(options["webp_quality"])]
+    return params
+
+
+def save_image(path, img, options=None, atomic=False):
+    """
+    Writes an RGB image with optional encoder options (see ENCODE_OPTIONS).
+    With atomic=True the file is written next to path under a temporary name
+    and renamed into place, so readers never see a half-written file.
+    """
+    params = encode_params(path, options)
+    bgr = cv2.cvtColor(img, cv2.COLOR_RGB2BGR)
+    if not atomic:
+        if not cv2.imwrite(path, bgr, params):
+            raise ValueError(f"Cannot write image: {path}")
+        return
+    ext = os.path.splitext(path)[1]
+    fd, tmp_path = tempfile.mkstemp(suffix=ext, prefix=".saving-", dir=os.path.dirname(os.path.abspath(path)))
+    os.close(fd)
+    try:
+        if not cv2.imwrite(tmp_path, bgr, params):
+            raise ValueError(f"Cannot write image: {path}")
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def load_recipe(path):
+    with open(path, "r", encoding="utf-8") as f:
+        recipe = json.load(f)
+    unknown = set(recipe) - RECIPE_KEYS
+    if unknown:
+        raise ValueError(f"Unknown recipe keys: {', '.join(sorted(unknown))}")
+    return recipe
+
+
+# --- Batch processing ---
+def _init_worker():
+    # One OpenCV thread per process; the pool already provides the parallelism
+    cv2.setNumThreads(1)
+
+
+def output_path(path, recipe, output_dir, input_root):
+    # Mirrors the path below input_root, so equal names in different
+    # subfolders of a recursive glob do not overwrite each other
+    name, ext = os.path.splitext(os.path.relpath(os.path.abspath(path), input_root))
+    return os.path.join(output_dir, name + recipe.get("format", ext))
+
+
+def process_file(path, recipe, output_dir, input_root=None):
+    """
+    Runs the recipe on one file and writes the result to output_dir, at the
+    same relative path as below input_root (default: the file's own folder).
+    Returns (path, input megapixels, seconds) so no pixel data crosses processes.
+    """
+    start = time.perf_counter()
+    img = load_image(path)
+    megapixels = img.shape[0] * img.shape[1] / 1e6
+    result = apply_recipe(img, recipe)
+    out = output_path(path, recipe, output_dir, input_root or os.path.dirname(os.path.abspath(path)))
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    save_image(out, result, recipe.get("encode"))
+    return path, megapixels, time.perf_counter() - start
+
+
+def run_batch(paths, recipe, output_dir, workers=None, max_pending=None):
+    """
+    Processes paths in a process pool. At most max_pending files are in flight,
+    which bounds memory to roughly max_pending decoded images. Outputs keep
+    the folder structure below the inputs' common folder; a ValueError is
+    raised before any work if two inputs would still write the same file.
+    Returns a summary dict with counts and throughput.
+    """
+    paths = list(paths)
+    input_root = os.path.commonpath([os.path.dirname(os.path.abspath(p)) for p in paths]) if paths else ""
+    outputs = {}
+    for path in paths:
+        out = os.path.normcase(output_path(path, recipe, output_dir, input_root))
+        if out in outputs:
+            raise ValueError(f"{path} and {outputs[out]} would both be written to {out}")
+        outputs[out] = path
+    os.makedirs(output_dir, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+    max_pending = max_pending or workers * 2
+    done = failed = 0
+    total_mp = 0.0
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        pending = set()
+        queue = iter(paths)
+        while True:
+            for path in queue:
+                pending.add(pool.submit(process_file, path, recipe, output_dir, input_root))
+                if len(pending) >= max_pending:
+                    break
+            if not pending:
+                break
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                try:
+                    _, megapixels, _ = future.result()
+                    done += 1
+                    total_mp += megapixels
+                except Exception as e:
+                    failed += 1
+                    print(f"Failed: {e}")
+    elapsed = time.perf_counter() - start
+    return {
+        "images": done,
+        "failed": failed,
+        "seconds": elapsed,
+        "images_per_sec": done / elapsed if elapsed else 0.0,
+        "mp_per_sec": total_mp / elapsed if elapsed else 0.0,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Apply an Image Editor recipe to many images.")
+    parser.add_argument("recipe", help="JSON recipe file")
+    parser.add_argument("pattern", help="Input glob, e.g. 'photos/**/*.jpg'")
+    parser.add_argument("-o", "--output", default="output", help="Output directory")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--max-pending", type=int, default=None,
+                        help="Files in flight at once (default: 2 per worker)")
+    args = parser.parse_args(argv)
+
+    recipe = load_recipe(args.recipe)
+    paths = sorted(glob.glob(args.pattern, recursive=True))
+    if not paths:
+        parser.error(f"No files match {args.pattern}")
+
+    try:
+        summary = run_batch(paths, recipe, args.output, args.workers, args.max_pending)
+    except ValueError as e:
+        parser.error(str(e))
+    print(f"Processed {summary['images']} images ({summary['failed']} failed) in {summary['seconds']:.2f}s")
+    print(f"Throughput: {summary['images_per_sec']:.2f} images/sec, {summary['mp_per_sec']:.2f} MP/sec")
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,57 +1,423 @@
-import turtle
-
-def draw_branch(t, branch_length, angle_left, angle_right, depth, reduction_factor, max_depth):
-    if depth == 0 or branch_length < 1:
-        return
-
-    # Change color based on depth
-    if depth == max_depth:
-        t.color("brown")
-        t.pensize(5)
-    else:
-        t.color("green")
-        t.pensize(2)
-
-    # Draw the branch
-    t.forward(branch_length)
-
-    # Left branch
-    t.left(angle_left)
-    draw_branch(t, branch_length * reduction_factor, angle_left, angle_right, depth - 1, reduction_factor, max_depth)
-
-    # Go to the other side
-    t.right(angle_left + angle_right)
-    draw_branch(t, branch_length * reduction_factor, angle_left, angle_right, depth - 1, reduction_factor, max_depth)
-
-    # Go back to original position and direction
-    t.left(angle_right)
-    t.backward(branch_length)
-
-def main():
-    # Get user input
-    angle_left = float(input("Enter left branch angle (degrees): "))
-    angle_right = float(input("Enter right branch angle (degrees): "))
-    start_length = float(input("Enter starting branch length (pixels): "))
-    depth = int(input("Enter recursion depth: "))
-    reduction_factor = float(input("Enter branch length reduction factor (e.g., 0.7): "))
-
-    # Set up turtle
-    screen = turtle.Screen()
-    screen.title("Recursive Tree")
-    screen.bgcolor("white")
-
-    t = turtle.Turtle()
-    t.hideturtle()  # Hide the turtle for a cleaner look
-    t.speed(1)
-    t.left(90)
-    t.penup()
-    t.goto(0, -250)
-    t.pendown()
-
-    draw_branch(t, start_length, angle_left, angle_right, depth, reduction_factor, depth)
-
-    screen.mainloop()
-
-if __name__ == "__main__":
-    main()
-
+import argparse
+import csv
+import itertools
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+import turtle
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+# Canvas size of exported images; the turtle origin is in the centre
+EXPORT_SIZE = (800, 800)
+
+# Tree parameters in the order of the prompts, as used by the sweep index
+SWEEP_PARAMS = ("angle_left", "angle_right", "start_length", "depth", "reduction_factor")
+
+class SegmentBatcher:
+    """
+    Screen refreshes for fast mode: with animation off (tracer(0, 0)) nothing
+    appears until screen.update(), so the screen is refreshed once every
+    batch_size segments, or only at the end when batch_size is 0.
+    """
+    def __init__(self, screen, batch_size=0):
+        self.screen = screen
+        self.batch_size = batch_size
+        self.segments = 0
+
+    def segment_drawn(self):
+        self.segments += 1
+        if self.batch_size and self.segments % self.batch_size == 0:
+            self.screen.update()
+
+    def finish(self):
+        self.screen.update()
+
+def draw_branch(t, branch_length, angle_left, angle_right, depth, reduction_factor, max_depth, batcher=None,
+                min_extent=0.0, canvas=None):
+    # Returns the number of segments drawn; min_extent and canvas prune
+    # subtrees as in tree_levels()
+    if depth == 0 or branch_length < 1:
+        return 0
+    if min_extent or canvas:
+        reach = branch_length / (1 - reduction_factor) if reduction_factor < 1 else float("inf")
+        if depth < max_depth and reach < min_extent:
+            return 0
+        if canvas:
+            x, y = t.position()
+            if abs(x) - reach > canvas[0] / 2 or abs(y) - reach > canvas[1] / 2:
+                return 0
+
+    # Change color based on depth
+    if depth == max_depth:
+        t.color("brown")
+        t.pensize(5)
+    else:
+        t.color("green")
+        t.pensize(2)
+
+    # Draw the branch
+    t.forward(branch_length)
+    if batcher:
+        batcher.segment_drawn()
+
+    # Left branch
+    t.left(angle_left)
+    drawn = 1 + draw_branch(t, branch_length * reduction_factor, angle_left, angle_right, depth - 1, reduction_factor,
+                            max_depth, batcher, min_extent, canvas)
+
+    # Go to the other side
+    t.right(angle_left + angle_right)
+    drawn += draw_branch(t, branch_length * reduction_factor, angle_left, angle_right, depth - 1, reduction_factor,
+                         max_depth, batcher, min_extent, canvas)
+
+    # Go back to original position and direction
+    t.left(angle_right)
+    t.backward(branch_length)
+    return drawn
+
+def tree_segment_count(start_length, depth, reduction_factor):
+    # Branches draw_branch draws: every level it reaches doubles the count
+    levels, length = 0, start_length
+    while levels < depth and length >= 1:
+        levels += 1
+        length *= reduction_factor
+    return 2 ** levels - 1
+
+def tree_levels(start_length, angle_left, angle_right, depth, reduction_factor, origin=(0, -250), heading=90,
+                min_extent=0.0, canvas=None):
+    """
+    The branches draw_branch draws, computed level by level with NumPy
+    instead of by walking a turtle (so no recursion limit). Returns one
+    (n, 4) array of x0, y0, x1, y1 per level, trunk first; level k holds the
+    2**k branches k steps below the trunk. See tree_branches() for the
+    parent of each branch.
+
+    Level of detail: a branch of length l and all its sub-branches lie within
+    l / (1 - reduction_factor) of its start. Subtrees smaller than min_extent
+    pixels are not subdivided any further, and with canvas=(width, height)
+    subtrees entirely outside the canvas (centred on the origin) are dropped.
+    Compare with tree_segment_count() for the number skipped.
+    """
+    return tree_branches(start_length, angle_left, angle_right, depth, reduction_factor, origin, heading,
+                         min_extent, canvas)[0]
+
+def tree_branches(start_length, angle_left, angle_right, depth, reduction_factor, origin=(0, -250), heading=90,
+                  min_extent=0.0, canvas=None):
+    # tree_levels() plus, per level, the row of each branch's parent in the
+    # level above (-1 for the trunk); left children come before right ones
+    width, height = canvas or (0, 0)
+    levels = []
+    parents = []
+    x = np.array([origin[0]], dtype=float)
+    y = np.array([origin[1]], dtype=float)
+    headings = np.array([heading], dtype=float)
+    parent = np.array([-1])
+    length = start_length
+    for level in range(depth):
+        if length < 1:
+            break
+        reach = length / (1 - reduction_factor) if reduction_factor < 1 else np.inf
+        if level > 0 and reach < min_extent:
+            break  # Every subtree of this level is below the threshold
+        if canvas:
+            visible = ((x + reach >= -width / 2) & (x - reach <= width / 2) &
+                       (y + reach >= -height / 2) & (y - reach <= height / 2))
+            if not visible.all():
+                x, y, headings, parent = x[visible], y[visible], headings[visible], parent[visible]
+                if not x.size:
+                    break
+        radians = np.radians(headings)
+        x_end = x + length * np.cos(radians)
+        y_end = y + length * np.sin(radians)
+        levels.append(np.column_stack((x, y, x_end, y_end)))
+        parents.append(parent)
+        # Every branch ends where its left and right children start
+        x = np.concatenate((x_end, x_end))
+        y = np.concatenate((y_end, y_end))
+        headings = np.concatenate((headings + angle_left, headings - angle_right))
+        rows = np.arange(len(x_end))
+        parent = np.concatenate((rows, rows))
+        length *= reduction_factor
+    return levels, parents
+
+def level_style(level):
+    # Colour and pen size of a level, as in draw_branch: brown trunk, green branches
+    return ("brown", 5) if level == 0 else ("green", 2)
+
+def depth_first(levels, parents):
+    # (level, segment) pairs in draw_branch's order: a branch, then its left
+    # subtree, then its right subtree
+    children = []
+    for parent in parents[1:]:
+        order = np.argsort(parent, kind="stable")  # Keeps left before right
+        bounds = np.searchsorted(parent[order], np.arange(len(parent) + 1))
+        children.append((order.tolist(), bounds.tolist()))
+    segments = [level.tolist() for level in levels]
+    stack = [(0, row) for row in reversed(range(len(segments[0])))] if segments else []
+    while stack:
+        level, row = stack.pop()
+        yield level, segments[level][row]
+        if level < len(children):
+            order, bounds = children[level]
+            stack.extend((level + 1, child) for child in reversed(order[bounds[row]:bounds[row + 1]]))
+
+def draw_levels(t, levels, parents, batcher=None):
+    # Branches come depth-first, so each one mostly starts where the last
+    # ended; the remaining pen-up jumps (instead of draw_branch's backward()
+    # strokes) are made at speed 0, which turtle does not animate
+    style = position = None
+    for level, (x0, y0, x1, y1) in depth_first(levels, parents):
+        if level_style(level) != style:
+            style = level_style(level)
+            t.color(style[0])
+            t.pensize(style[1])
+        if (x0, y0) != position:
+            speed = t.speed()
+            t.penup()
+            t.speed(0)
+            t.goto(x0, y0)
+            t.speed(speed)
+            t.pendown()
+        t.goto(x1, y1)
+        position = (x1, y1)
+        if batcher:
+            batcher.segment_drawn()
+    t.penup()
+
+def to_canvas(segments, size):
+    # Turtle coordinates (origin in the centre, y up) to image pixels (y down)
+    width, height = size
+    return np.column_stack((segments[:, 0] + width / 2, height / 2 - segments[:, 1],
+                            segments[:, 2] + width / 2, height / 2 - segments[:, 3]))
+
+def export_png(levels, path, size=EXPORT_SIZE):
+    image = Image.new("RGB", size, "white")
+    draw = ImageDraw.Draw(image)
+    for level, segments in enumerate(levels):
+        color, pensize = level_style(level)
+        for line in to_canvas(segments, size).tolist():
+            draw.line(line, fill=color, width=pensize)
+    image.save(path)
+
+def export_svg(levels, path, size=EXPORT_SIZE):
+    # One path element per level keeps large trees small and quick to parse
+    width, height = size
+    parts = [f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" viewBox="0 0 {width} {height}">',
+             '<rect width="100%" height="100%" fill="white"/>']
+    for level, segments in enumerate(levels):
+        color, pensize = level_style(level)
+        d = " ".join(f"M{x0:.2f} {y0:.2f}L{x1:.2f} {y1:.2f}" for x0, y0, x1, y1 in to_canvas(segments, size).tolist())
+        parts.append(f'<path d="{d}" stroke="{color}" stroke-width="{pensize}" stroke-linecap="round" fill="none"/>')
+    parts.append("</svg>")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n".join(parts))
+
+def export_tree(path, angle_left, angle_right, start_length, depth, reduction_factor, size=EXPORT_SIZE, lod=0.0):
+    """
+    Renders the tree to a .png or .svg file without opening a window. With
+    lod > 0 subtrees under lod pixels or outside the image are skipped.
+    Returns the segments drawn and skipped and the geometry and render times in ms.
+    """
+    exporters = {".png": export_png, ".svg": export_svg}
+    suffix = path[path.rfind("."):].lower()
+    if suffix not in exporters:
+        raise ValueError(f"Unsupported export format: {path} (use .png or .svg)")
+    start = time.perf_counter()
+    if lod:
+        levels = tree_levels(start_length, angle_left, angle_right, depth, reduction_factor,
+                             min_extent=lod, canvas=size)
+    else:
+        levels = tree_levels(start_length, angle_left, angle_right, depth, reduction_factor)
+    geometry_done = time.perf_counter()
+    exporters[suffix](levels, path, size)
+    end = time.perf_counter()
+    segments = sum(len(level) for level in levels)
+    return {
+        "segments": segments,
+        "skipped": tree_segment_count(start_length, depth, reduction_factor) - segments,
+        "geometry_ms": (geometry_done - start) * 1000,
+        "render_ms": (end - geometry_done) * 1000,
+    }
+
+def render_variant(number, params, output_dir, fmt, size, lod=0.0):
+    # One sweep image; returns its index row so no image data crosses processes
+    angle_left, angle_right, start_length, depth, reduction_factor = params
+    params = (angle_left, angle_right, start_length, int(depth), reduction_factor)
+    name = f"tree_{number:05d}.{fmt}"
+    stats = export_tree(os.path.join(output_dir, name), *params, size, lod)
+    row = {"file": name}
+    row.update(zip(SWEEP_PARAMS, params))
+    row["segments"] = stats["segments"]
+    row["skipped"] = stats["skipped"]
+    row["geometry_ms"] = round(stats["geometry_ms"], 3)
+    row["render_ms"] = round(stats["render_ms"], 3)
+    return row
+
+def run_sweep(combinations, output_dir, fmt="png", size=EXPORT_SIZE, workers=None, max_pending=None, lod=0.0):
+    """
+    Renders every parameter combination in a process pool and writes
+    index.csv and index.json (one row per image) to output_dir. At most
+    max_pending images are in flight. Returns a summary dict.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+    max_pending = max_pending or workers * 2
+    rows = []
+    failed = 0
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = {}  # Future -> (number, params), to name failed variants
+        queue = iter(enumerate(combinations))
+        while True:
+            for number, params in queue:
+                future = pool.submit(render_variant, number, params, output_dir, fmt, size, lod)
+                pending[future] = (number, params)
+                if len(pending) >= max_pending:
+                    break
+            if not pending:
+                break
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                number, params = pending.pop(future)
+                try:
+                    rows.append(future.result())
+                except Exception as e:
+                    failed += 1
+                    values = ", ".join(f"{name}={value:g}" for name, value in zip(SWEEP_PARAMS, params))
+                    print(f"Failed: tree_{number:05d} ({values}): {e}")
+    elapsed = time.perf_counter() - start
+
+    rows.sort(key=lambda row: row["file"])
+    if rows:
+        with open(os.path.join(output_dir, "index.csv"), "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+            writer.writeheader()
+            writer.writerows(rows)
+    with open(os.path.join(output_dir, "index.json"), "w", encoding="utf-8") as f:
+        json.dump(rows, f, indent=1)
+    return {
+        "images": len(rows),
+        "failed": failed,
+        "seconds": elapsed,
+        "images_per_sec": len(rows) / elapsed if elapsed else 0.0,
+        "segments": sum(row["segments"] for row in rows),
+        "skipped": sum(row["skipped"] for row in rows),
+    }
+
+def parse_range(text):
+    # "30", "20,30,45" or "START:STOP:STEP" with STOP included
+    if ":" in text:
+        start, stop, step = (float(v) for v in text.split(":"))
+        if step <= 0:
+            raise argparse.ArgumentTypeError(f"Step must be positive: {text}")
+        count = int(round((stop - start) / step)) + 1
+        return [round(start + i * step, 6) for i in range(count)]
+    return [float(v) for v in text.split(",")]
+
+def parse_size(text):
+    width, height = text.lower().split("x")
+    return int(width), int(height)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Recursive Tree")
+    parser.add_argument("--fast", action="store_true",
+                        help="Draw without animation and report the draw time")
+    parser.add_argument("--batch", type=int, default=0, metavar="N",
+                        help="With --fast: refresh the screen every N segments (default: once at the end)")
+    parser.add_argument("--iterative", action="store_true",
+                        help="Precompute the branches with NumPy and draw them without recursion")
+    parser.add_argument("--tree", nargs=5, type=float, default=None,
+                        metavar=("LEFT", "RIGHT", "LENGTH", "DEPTH", "FACTOR"),
+                        help="Tree parameters instead of the prompts")
+    parser.add_argument("--export", default=None, metavar="FILE",
+                        help="Write the tree to FILE (.png or .svg) without opening a window")
+    parser.add_argument("--size", type=parse_size, default=EXPORT_SIZE, metavar="WxH",
+                        help="With --export: image size (default 800x800)")
+    parser.add_argument("--lod", type=float, default=0.0, metavar="PIXELS",
+                        help="Skip subtrees under PIXELS across or off the canvas. A subtree is at least as "
+                             "large as its first branch and branches under 1 px already stop, so PIXELS <= 1 "
+                             "only skips subtrees off the canvas")
+    parser.add_argument("--sweep", action="store_true",
+                        help="Render every combination of the ranges below to --output, without a window")
+    parser.add_argument("--left", type=parse_range, default=[30.0], metavar="RANGE",
+                        help="Sweep left angles: 30, 20,30,45 or 10:60:5 (stop included)")
+    parser.add_argument("--right", type=parse_range, default=[30.0], metavar="RANGE", help="Sweep right angles")
+    parser.add_argument("--length", type=parse_range, default=[150.0], metavar="RANGE", help="Sweep start lengths")
+    parser.add_argument("--depth", type=parse_range, default=[10.0], metavar="RANGE", help="Sweep depths")
+    parser.add_argument("--factor", type=parse_range, default=[0.7], metavar="RANGE", help="Sweep reduction factors")
+    parser.add_argument("--format", choices=("png", "svg"), default="png", help="Sweep image format")
+    parser.add_argument("-o", "--output", default="trees", help="Sweep output directory")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="Sweep worker processes (default: CPU count)")
+    parser.add_argument("--max-pending", type=int, default=None,
+                        help="Sweep images in flight at once (default: 2 per worker)")
+    args = parser.parse_args(argv)
+
+    if args.sweep:
+        combinations = list(itertools.product(args.left, args.right, args.length, args.depth, args.factor))
+        summary = run_sweep(combinations, args.output, args.format, args.size, args.workers, args.max_pending, args.lod)
+        print(f"Rendered {summary['images']} trees ({summary['failed']} failed, {summary['segments']} segments, "
+              f"{summary['skipped']} skipped) "
+              f"in {summary['seconds']:.2f}s, {summary['images_per_sec']:.1f} images/sec")
+        print(f"Index: {os.path.join(args.output, 'index.csv')}, {os.path.join(args.output, 'index.json')}")
+        return 1 if summary["failed"] else 0
+
+    if args.tree:
+        angle_left, angle_right, start_length, depth, reduction_factor = args.tree
+        depth = int(depth)
+    else:
+        # Get user input
+        angle_left = float(input("Enter left branch angle (degrees): "))
+        angle_right = float(input("Enter right branch angle (degrees): "))
+        start_length = float(input("Enter starting branch length (pixels): "))
+        depth = int(input("Enter recursion depth: "))
+        reduction_factor = float(input("Enter branch length reduction factor (e.g., 0.7): "))
+
+    if args.export:
+        stats = export_tree(args.export, angle_left, angle_right, start_length, depth, reduction_factor,
+                            args.size, args.lod)
+        print(f"Wrote {args.export}: {stats['segments']} segments, {stats['skipped']} skipped | geometry {stats['geometry_ms']:.1f} ms | "
+              f"render {stats['render_ms']:.1f} ms")
+        return
+
+    # Set up turtle
+    screen = turtle.Screen()
+    screen.title("Recursive Tree")
+    screen.bgcolor("white")
+
+    t = turtle.Turtle()
+    t.hideturtle()  # Hide the turtle for a cleaner look
+    t.speed(1)
+    batcher = None
+    if args.fast:
+        screen.tracer(0, 0)  # No animation; the batcher decides when to refresh
+        batcher = SegmentBatcher(screen, args.batch)
+    t.left(90)
+    t.penup()
+    t.goto(0, -250)
+    t.pendown()
+
+    canvas = (screen.window_width(), screen.window_height()) if args.lod else None
+    start = time.perf_counter()
+    if args.iterative:
+        levels, parents = tree_branches(start_length, angle_left, angle_right, depth, reduction_factor,
+                                        min_extent=args.lod, canvas=canvas)
+        draw_levels(t, levels, parents, batcher)
+        drawn = sum(len(level) for level in levels)
+    else:
+        drawn = draw_branch(t, start_length, angle_left, angle_right, depth, reduction_factor, depth, batcher,
+                            args.lod, canvas)
+    if args.iterative or args.lod:
+        print(f"Segments drawn: {drawn}, skipped: {tree_segment_count(start_length, depth, reduction_factor) - drawn}")
+    if batcher:
+        batcher.finish()
+        print(f"Drew {batcher.segments} segments in {time.perf_counter() - start:.2f}s")
+    else:
+        print(f"Draw time: {time.perf_counter() - start:.2f}s")
+
+    screen.mainloop()
+
+if __name__ == "__main__":
+    raise SystemExit(main())